@@ -23,21 +23,72 @@ class Creator(object):
         obj.__dict__[self.field.name] = self.field.to_python(value)
 
 
+class DeferredValue(object):
+    """
+    Holds the raw dictionary returned by the database driver
+    until the attribute is accessed for the first time.
+    """
+    def __init__(self, raw):
+        self.raw = raw
+
+
 class HStoreDescriptor(Creator):
     _DictClass = HStoreDict
 
     def __init__(self, *args, **kwargs):
         self.schema_mode = kwargs.pop('schema_mode', False)
+        self.lazy = kwargs.pop('lazy', False)
         super(HStoreDescriptor, self).__init__(*args, **kwargs)
 
+    def __get__(self, obj, type=None):
+        if obj is None:
+            return self
+        value = obj.__dict__[self.field.name]
+        if isinstance(value, DeferredValue):
+            value = self._materialize(obj, value.raw)
+        return value
+
     def __set__(self, obj, value):
+        # in lazy mode values loaded from the DB are kept as they are
+        # and converted only when the attribute is accessed
+        if self.lazy and type(value) is dict and self._from_db(obj):
+            obj.__dict__[self.field.name] = DeferredValue(value)
+            return
         value = self.field.to_python(value)
-        if isinstance(value, dict):
+        if isinstance(value, self._DictClass) and value.field is self.field and value.instance is None \
+           and self._from_db(obj):
+            # unbound dictionary coming from the field (``from_db_value``) while
+            # the row is loaded, bind it to the instance instead of copying it;
+            # values assigned afterwards (eg: coming from ``values()``) are copied
+            value.instance = obj
+            value.schema_mode = self.schema_mode
+        elif isinstance(value, dict):
             value = self._DictClass(
                 value=value, field=self.field, instance=obj, schema_mode=self.schema_mode
             )
         obj.__dict__[self.field.name] = value
 
+    def _from_db(self, obj):
+        """
+        the instance is being initialized with a row coming from the DB
+        (same heuristic used by ``SerializedDictionaryField._from_db``)
+        """
+        return obj._state.adding and obj.__dict__.get(obj._meta.pk.attname) is not None
+
+    def _materialize(self, obj, raw):
+        # if the instance is still being added the deferred value
+        # was passed by the user (eg: ``Model(pk=1, data={...})``)
+        if obj._state.adding:
+            value = self._DictClass(
+                value=raw, field=self.field, instance=obj, schema_mode=self.schema_mode
+            )
+        else:
+            value = self.field._dict_from_db(raw)
+            value.instance = obj
+            value.schema_mode = self.schema_mode
+        obj.__dict__[self.field.name] = value
+        return value
+
 
 class SerializedDictDescriptor(Creator):
     _DictClass = dict
@@ -1,5 +1,6 @@
 import json
 
+from collections import namedtuple
 from decimal import Decimal
 
 from django.utils import six
@@ -22,11 +23,21 @@ class DecimalEncoder(json.JSONEncoder):
         return json.JSONEncoder.default(self, obj)
 
 
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'currsize'])
+
+
 class HStoreDict(UnicodeMixin, dict):
     """
     A dictionary subclass which implements hstore support.
     """
     schema_mode = False  # python2.6 compatibility
+    _tracking = False
+    # only some keys have been loaded from the DB (see ``HStoreQuerySet.only_keys``)
+    _partial = False
+    # per key cache of the values converted in schema mode
+    _typed_values = None
+    _cache_hits = 0
+    _cache_misses = 0
 
     def __init__(self, value=None, field=None, instance=None, schema_mode=False, **kwargs):
         self.schema_mode = schema_mode
@@ -59,6 +70,19 @@ class HStoreDict(UnicodeMixin, dict):
         self.field = field
         self.instance = instance
 
+    @classmethod
+    def from_db(cls, value, field=None):
+        """
+        trusted constructor for dictionaries returned by psycopg2:
+        keys and values are already strings (or None) so they are
+        neither validated nor converted
+        """
+        obj = cls.__new__(cls)
+        dict.update(obj, value)
+        obj.field = field
+        obj.instance = None
+        return obj
+
     def __setitem__(self, *args, **kwargs):
         """
         perform checks before setting the value of a key
@@ -68,6 +92,15 @@ class HStoreDict(UnicodeMixin, dict):
         # prepare *args
         args = (args[0], value)
         super(HStoreDict, self).__setitem__(*args, **kwargs)
+        if self._typed_values:
+            self._typed_values.pop(args[0], None)
+        if self._tracking:
+            self._changed_keys.add(args[0])
+            self._removed_keys.discard(args[0])
+
+    def __delitem__(self, key):
+        super(HStoreDict, self).__delitem__(key)
+        self._track_removal(key)
 
     def __getitem__(self, *args, **kwargs):
         """
@@ -76,10 +109,19 @@ class HStoreDict(UnicodeMixin, dict):
         value = super(HStoreDict, self).__getitem__(*args, **kwargs)
 
         if self.schema_mode:
+            key = args[0]
+            if self._typed_values is None:
+                self._typed_values = {}
+            elif key in self._typed_values:
+                self._cache_hits += 1
+                return self._typed_values[key]
             try:
-                return self.instance._hstore_virtual_fields[args[0]].to_python(value)
+                virtual_field = self.instance._hstore_virtual_fields[key]
             except KeyError:
                 pass
+            else:
+                self._cache_misses += 1
+                value = self._typed_values[key] = virtual_field.to_python(value)
 
         return value
 
@@ -108,6 +150,65 @@ class HStoreDict(UnicodeMixin, dict):
         for key, value in dict(*args, **kwargs).items():
             self[key] = value
 
+    def pop(self, key, *args):
+        if key in self:
+            self._track_removal(key)
+        return super(HStoreDict, self).pop(key, *args)
+
+    def popitem(self):
+        key, value = super(HStoreDict, self).popitem()
+        self._track_removal(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return super(HStoreDict, self).__getitem__(key)
+
+    def clear(self):
+        for key in list(self.keys()):
+            self._track_removal(key)
+        super(HStoreDict, self).clear()
+
+    def _track_removal(self, key):
+        if self._typed_values:
+            self._typed_values.pop(key, None)
+        if self._tracking:
+            self._changed_keys.discard(key)
+            self._removed_keys.add(key)
+
+    def _mark_clean(self):
+        """
+        considers the current content as persisted and starts
+        recording the keys which are set or deleted from now on
+        """
+        self._tracking = True
+        self._changed_keys = set()
+        self._removed_keys = set()
+
+    def _mark_partial(self):
+        """
+        marks the dictionary as containing only some of the keys
+        stored in the DB: saving it merges the changes instead of
+        replacing the whole value
+        """
+        self._partial = True
+        self._mark_clean()
+
+    def _get_changes(self):
+        """
+        returns a tuple containing a dictionary of the keys set
+        and a list of the keys deleted since ``_mark_clean`` was called
+        """
+        changed = dict((key, dict.__getitem__(self, key)) for key in self._changed_keys)
+        return changed, list(self._removed_keys)
+
+    def cache_info(self):
+        """
+        statistics of the cache of values converted in schema mode
+        """
+        return CacheInfo(self._cache_hits, self._cache_misses, len(self._typed_values or ()))
+
     def ensure_acceptable_value(self, value):
         """
         if schema_mode disabled (default behaviour):
@@ -140,6 +241,9 @@ class HStoreDict(UnicodeMixin, dict):
         """
         Removes the specified keys from this dictionary.
         """
+        if self._typed_values:
+            for key in (keys if isinstance(keys, (list, tuple)) else [keys]):
+                self._typed_values.pop(key, None)
         queryset = self.instance._base_manager.get_query_set()
         queryset.filter(pk=self.instance.pk).hremove(self.field.name, keys)
 
@@ -163,3 +267,27 @@ class HStoreReferenceDict(HStoreDict):
             return self.__getitem__(key)
         except KeyError:
             return default
+
+    def unresolved_references(self):
+        """
+        Returns the references which have not been converted to model instances yet.
+        """
+        return dict((key, value) for key, value in dict.items(self)
+                    if isinstance(value, six.string_types))
+
+    def resolve_all(self, instances=None):
+        """
+        Replaces all the unresolved references with model instances
+        by running one query for each referenced model.
+        ``instances`` may contain references already resolved
+        (as returned by ``utils.acquire_references``),
+        invalid references are left unresolved.
+        """
+        pending = self.unresolved_references()
+        if pending:
+            if instances is None:
+                instances = utils.acquire_references(pending.values())
+            for key, reference in pending.items():
+                if reference in instances:
+                    self.__setitem__(key, instances[reference])
+        return self
@@ -5,11 +5,13 @@ import json
 
 import django
 from django.db import models
+from django.db.models.query_utils import QueryWrapper
+from django.db.models.signals import class_prepared, post_save
 from django.utils import six
 from django.utils.translation import ugettext_lazy as _
 
 from . import forms, utils
-from .descriptors import HStoreDescriptor, HStoreReferenceDescriptor, SerializedDictDescriptor
+from .descriptors import DeferredValue, HStoreDescriptor, HStoreReferenceDescriptor, SerializedDictDescriptor
 from .dict import HStoreDict, HStoreReferenceDict
 from .virtual import create_hstore_virtual_field
 
@@ -65,6 +67,13 @@ class HStoreField(models.Field):
     def db_type(self, connection=None):
         return 'hstore'
 
+    def get_transform(self, name):
+        transform = super(HStoreField, self).get_transform(name)
+        if transform:
+            return transform
+        # any other name is a key
+        return KeyTransformFactory(name)
+
     def south_field_triple(self):  # pragma no cover
         from south.modelsinspector import introspector
         name = '%s.%s' % (self.__class__.__module__, self.__class__.__name__)
@@ -73,16 +82,21 @@ class HStoreField(models.Field):
 
 
 if django.VERSION >= (1, 7):
-    from .lookups import (HStoreGreaterThan, HStoreGreaterThanOrEqual, HStoreLessThan,
-                          HStoreLessThanOrEqual, HStoreContains, HStoreIContains, HStoreIsNull)
+    from .lookups import (HStoreGreaterThan, HStoreGreaterThanOrEqual, HStoreLessThan, HStoreLessThanOrEqual,
+                          HStoreContains, HStoreGinContains, HStoreIContains, HStoreIsNull,
+                          HStoreHasKey, HStoreHasKeys, HStoreHasAnyKeys, KeyTransformFactory)
 
     HStoreField.register_lookup(HStoreGreaterThan)
     HStoreField.register_lookup(HStoreGreaterThanOrEqual)
     HStoreField.register_lookup(HStoreLessThan)
     HStoreField.register_lookup(HStoreLessThanOrEqual)
     HStoreField.register_lookup(HStoreContains)
+    HStoreField.register_lookup(HStoreGinContains)
     HStoreField.register_lookup(HStoreIContains)
     HStoreField.register_lookup(HStoreIsNull)
+    HStoreField.register_lookup(HStoreHasKey)
+    HStoreField.register_lookup(HStoreHasKeys)
+    HStoreField.register_lookup(HStoreHasAnyKeys)
 
 
 class DictionaryField(HStoreField):
@@ -90,6 +104,10 @@ class DictionaryField(HStoreField):
 
     def __init__(self, *args, **kwargs):
         self.schema = kwargs.pop('schema', None)
+        self.track_changes = kwargs.pop('track_changes', False)
+        self.lazy = kwargs.pop('lazy', False)
+        # compile the ``contains`` lookups with dictionaries to ``@>``
+        self.gin_contains = kwargs.pop('gin_contains', False)
         self.schema_mode = False
         # if schema parameter is supplied the behaviour is slightly different
         if self.schema is not None:
@@ -111,15 +129,77 @@ class DictionaryField(HStoreField):
 
     def contribute_to_class(self, cls, name):
         super(DictionaryField, self).contribute_to_class(cls, name)
-        setattr(cls, self.name, HStoreDescriptor(self, schema_mode=self.schema_mode))
+        setattr(cls, self.name, HStoreDescriptor(self, schema_mode=self.schema_mode, lazy=self.lazy))
 
         if self.schema:
             self._create_hstore_virtual_fields(cls, name)
 
+        # resets the tracked changes, which are also used by partial dictionaries;
+        # proxies and subclasses are connected by _connect_inherited_fields
+        if not cls._meta.abstract:
+            post_save.connect(self._mark_clean, sender=cls)
+
     def formfield(self, **kwargs):
         kwargs['form_class'] = forms.DictionaryField
         return super(DictionaryField, self).formfield(**kwargs)
 
+    def from_db_value(self, value, expression, connection, context):
+        """
+        wraps values loaded from the database in an HStoreDict which
+        is adopted as is by the descriptor (see ``HStoreDescriptor.__set__``);
+        in lazy mode the raw value is left to the descriptor
+        """
+        if value is None or self.lazy:
+            return value
+        return self._dict_from_db(value)
+
+    def _dict_from_db(self, value):
+        value = HStoreDict.from_db(value, self)
+        if self.track_changes:
+            value._mark_clean()
+        return value
+
+    def pre_save(self, model_instance, add):
+        """
+        when ``track_changes`` is enabled (or the value is partial), updates of existing
+        rows only send the keys which have been set or deleted since the value was loaded
+        """
+        sql = '"%s"' % self.column
+        # lazy value loaded from the DB which has never been accessed, leave it untouched;
+        # instances being added hold the values passed by the user (eg: ``Model(pk=1, data={...})``)
+        if not model_instance._state.adding and \
+           isinstance(model_instance.__dict__.get(self.name), DeferredValue):
+            return QueryWrapper(sql, [])
+        value = super(DictionaryField, self).pre_save(model_instance, add)
+        # instances which have not been loaded from the DB (eg: ``Model(pk=1, data={...})``)
+        # replace the whole value even if it's tracked
+        if add or model_instance._state.adding or not isinstance(value, HStoreDict) or not value._tracking:
+            return value
+        changed, removed = value._get_changes()
+        params = []
+        if not changed and not removed:
+            return QueryWrapper(sql, params)
+        sql = 'COALESCE(%s, \'\'::hstore)' % sql
+        if removed:
+            sql = 'delete(%s, %%s::text[])' % sql
+            params.append(removed)
+        if changed:
+            sql = '%s || %%s' % sql
+            params.append(self.get_prep_value(changed))
+        return QueryWrapper(sql, params)
+
+    def _mark_clean(self, sender, instance, update_fields=None, **kwargs):
+        """
+        post_save handler, resets the change tracking of the saved HStoreDict
+        """
+        if not isinstance(instance, self.model):
+            return
+        if update_fields is not None and self.name not in update_fields:
+            return
+        value = instance.__dict__.get(self.name)
+        if isinstance(value, HStoreDict) and (self.track_changes or value._tracking):
+            value._mark_clean()
+
     def _value_to_python(self, value):
         return value
 
@@ -181,7 +261,7 @@ class DictionaryField(HStoreField):
         # remove any existing virtual field
         self._remove_hstore_virtual_fields()
         # set new descriptor on model class
-        setattr(self.model, self.name, HStoreDescriptor(self, schema_mode=self.schema_mode))
+        setattr(self.model, self.name, HStoreDescriptor(self, schema_mode=self.schema_mode, lazy=self.lazy))
         # create virtual fields
         self._create_hstore_virtual_fields(self.model, self.name)
 
@@ -227,6 +307,11 @@ class DictionaryField(HStoreField):
 class ReferencesField(HStoreField):
     description = _("A python dictionary of references to model instances in an hstore field.")
 
+    def __init__(self, *args, **kwargs):
+        # store references as "content_type_id:pk" instead of "module.Model:pk"
+        self.compact = kwargs.pop('compact', False)
+        super(ReferencesField, self).__init__(*args, **kwargs)
+
     def contribute_to_class(self, cls, name):
         super(ReferencesField, self).contribute_to_class(cls, name)
         setattr(cls, self.name, HStoreReferenceDescriptor(self))
@@ -237,11 +322,16 @@ class ReferencesField(HStoreField):
 
     def get_prep_lookup(self, lookup, value):
         if isinstance(value, dict):
-            return utils.serialize_references(value)
+            return utils.serialize_references(value, compact=self.compact)
         return value
 
     def get_prep_value(self, value):
-        return utils.serialize_references(value)
+        return utils.serialize_references(value, compact=self.compact)
+
+    def from_db_value(self, value, expression, connection, context):
+        if value is None:
+            return value
+        return HStoreReferenceDict.from_db(value, self)
 
     def to_python(self, value):
         return value if isinstance(value, dict) else HStoreReferenceDict({})
@@ -250,6 +340,12 @@ class ReferencesField(HStoreField):
         return utils.acquire_reference(value)
 
 
+if django.VERSION >= (1, 7):
+    from .lookups import HStoreReferences
+
+    ReferencesField.register_lookup(HStoreReferences)
+
+
 class SerializedDictionaryField(HStoreField):
     description = _("A python dictionary in a postgresql hstore field.")
 
@@ -340,6 +436,23 @@ class SerializedDictionaryField(HStoreField):
             return value
 
 
+def _connect_inherited_fields(sender, **kwargs):
+    """
+    class_prepared handler, connects the post_save handler of the dictionary fields
+    inherited by proxies and multi-table subclasses to the saves of these models
+    """
+    for base in sender.__mro__[1:]:
+        opts = getattr(base, '_meta', None)
+        if opts is None or opts.abstract:
+            continue
+        for field in opts.local_fields:
+            if isinstance(field, DictionaryField) and field.model is base:
+                post_save.connect(field._mark_clean, sender=sender)
+
+
+class_prepared.connect(_connect_inherited_fields)
+
+
 # south compatibility
 try:  # pragma no cover
     from south.modelsinspector import add_introspection_rules
@@ -1,6 +1,8 @@
 from __future__ import unicode_literals, absolute_import
 
+from django import VERSION as DJANGO_VERSION
 from django.utils import six
+from django.db import models
 from django.db.models.lookups import (
     GreaterThan,
     GreaterThanOrEqual,
@@ -8,10 +10,18 @@ from django.db.models.lookups import (
     LessThanOrEqual,
     Contains,
     IContains,
-    IsNull
+    IsNull,
+    Lookup,
+    Transform
 )
 
-from django_hstore.utils import get_cast_for_param, get_value_annotations
+from django_hstore.utils import (
+    KEY_CASTS,
+    get_cast_for_param,
+    get_key_sql,
+    get_value_annotations,
+    identify_instance
+)
 
 
 __all__ = [
@@ -21,8 +31,17 @@ __all__ = [
     'HStoreLessThan',
     'HStoreLessThanOrEqual',
     'HStoreContains',
+    'HStoreGinContains',
     'HStoreIContains',
-    'HStoreIsNull'
+    'HStoreIsNull',
+    'HStoreHasKey',
+    'HStoreHasKeys',
+    'HStoreHasAnyKeys',
+    'HStoreReferences',
+    'KeyTransform',
+    'KeyTransformFactory',
+    'KeyCastTransform',
+    'hstore_key'
 ]
 
 
@@ -47,12 +66,15 @@ class HStoreComparisonLookupMixin(HStoreLookupMixin):
             sign = (self.lookup_name[0] == 'g' and '>%s' or '<%s') % (self.lookup_name[-1] == 'e' and '=' or '')
             param_keys = list(param.keys())
             conditions = []
+            params = []
 
+            # keys are passed as parameters so that the statement is the same for any key
             for key in param_keys:
                 cast = get_cast_for_param(self.value_annot, key)
-                conditions.append('(%s->\'%s\')%s %s %%s' % (lhs, key, cast, sign))
+                conditions.append('%s%s %s %%s' % (get_key_sql(lhs), cast, sign))
+                params.extend(lhs_params + [key, param[key]])
 
-            return (" AND ".join(conditions), param.values())
+            return (" AND ".join(conditions), params)
 
         raise ValueError('invalid value')
 
@@ -74,6 +96,8 @@ class HStoreLessThanOrEqual(HStoreComparisonLookupMixin, LessThanOrEqual):
 
 
 class HStoreContains(HStoreLookupMixin, Contains):
+    # compile dictionaries to ``@>`` only (see ``as_gin_sql``)
+    gin = False
 
     def as_postgresql(self, compiler, connection):
         lhs, lhs_params = self.process_lhs(compiler, connection)
@@ -83,24 +107,27 @@ class HStoreContains(HStoreLookupMixin, Contains):
             lhs = '{0}{1}'.format(lhs[:-4], 'hstore')
         param = self.rhs
 
-        if isinstance(param, dict):
+        if isinstance(param, dict) and (self.gin or (
+                self.lookup_name == 'contains' and getattr(self.lhs.output_field, 'gin_contains', False))):
+            return self.as_gin_sql(lhs, lhs_params, param)
+        elif isinstance(param, dict):
             values = list(param.values())
             keys = list(param.keys())
             if len(values) == 1 and isinstance(values[0], (list, tuple)):
                 # Can't cast here because the list could contain multiple types
-                return '%s->\'%s\' = ANY(%%s)' % (lhs, keys[0]), [[str(x) for x in values[0]]]
+                return '%s = ANY(%%s)' % get_key_sql(lhs), lhs_params + [keys[0], [str(x) for x in values[0]]]
             elif len(keys) == 1 and len(values) == 1:
                 # Retrieve key and compare to param instead of using '@>' in order to cast hstore value
                 cast = get_cast_for_param(self.value_annot, keys[0])
-                return ('(%s->\'%s\')%s = %%s' % (lhs, keys[0], cast), [values[0]])
-            return '%s @> %%s' % lhs, [param]
+                return ('%s%s = %%s' % (get_key_sql(lhs), cast), lhs_params + [keys[0], values[0]])
+            return '%s @> %%s' % lhs, lhs_params + [param]
         elif isinstance(param, (list, tuple)):
             if len(param) == 0:
                 raise ValueError('invalid value')
             if len(param) < 2:
-                return '%s ? %%s' % lhs, [param[0]]
+                return '%s ? %%s' % lhs, lhs_params + [param[0]]
             if param:
-                return '%s ?& %%s' % lhs, [param]
+                return '%s ?& %%s' % lhs, lhs_params + [param]
         elif isinstance(param, six.string_types):
             # if looking for a string perform the normal text lookup
             # that is: look for occurence of string in all the keys
@@ -116,6 +143,43 @@ class HStoreContains(HStoreLookupMixin, Contains):
             raise ValueError('invalid value')
         return super(HStoreContains, self).as_sql(compiler, connection)
 
+    def as_gin_sql(self, lhs, lhs_params, param):
+        """
+        compiles the dictionary to ``@>`` (and lists of values to an OR of ``@>``)
+        which, unlike the comparison of the values, can use a GIN index;
+        values are compared as strings
+        """
+        field = self.lhs.output_field
+        scalars = dict((key, value) for key, value in param.items() if not isinstance(value, (list, tuple)))
+        conditions = []
+        params = []
+        if scalars or not param:
+            conditions.append('%s @> %%s' % lhs)
+            params.extend(lhs_params + [field.get_prep_value(scalars)])
+        for key, values in param.items():
+            if not isinstance(values, (list, tuple)):
+                continue
+            if not values:
+                raise ValueError('invalid value')
+            conditions.append('(%s)' % ' OR '.join(['%s @> %%s' % lhs] * len(values)))
+            for value in values:
+                params.extend(lhs_params + [field.get_prep_value({key: value})])
+        return ' AND '.join(conditions), params
+
+
+class HStoreGinContains(HStoreContains):
+    """
+    ``contains`` which compiles dictionaries to ``@>`` (see ``HStoreContains.as_gin_sql``).
+    """
+    lookup_name = 'gin_contains'
+    gin = True
+
+    def as_postgresql(self, compiler, connection):
+        # text searches can't use the index anyway
+        if not isinstance(self.rhs, (dict, list, tuple)):
+            raise ValueError('invalid value')
+        return super(HStoreGinContains, self).as_postgresql(compiler, connection)
+
 
 class HStoreIContains(IContains, HStoreContains):
     pass
@@ -130,11 +194,153 @@ class HStoreIsNull(IsNull):
             param = self.rhs
             param_keys = list(param.keys())
             conditions = []
+            params = []
 
             for key in param_keys:
                 op = 'IS NULL' if param[key] else 'IS NOT NULL'
-                conditions.append('(%s->\'%s\') %s' % (lhs, key, op))
+                conditions.append('%s %s' % (get_key_sql(lhs), op))
+                params.extend(lhs_params + [key])
 
-            return (" AND ".join(conditions), lhs_params)
+            return (" AND ".join(conditions), params)
 
         return super(HStoreIsNull, self).as_sql(compiler, connection)
+
+
+class HStoreKeyLookupMixin(object):
+    """
+    Mixin for the lookups which check the presence of keys
+    with one of the hstore key operators.
+    """
+    operator = None
+    many = True
+
+    def get_prep_lookup(self):
+        if self.many:
+            if not isinstance(self.rhs, (list, tuple)) or not self.rhs:
+                raise ValueError('invalid value')
+            return [six.text_type(key) for key in self.rhs]
+        if not isinstance(self.rhs, six.string_types):
+            raise ValueError('invalid value')
+        return self.rhs
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs = '%s::text[]' if self.many else '%s'
+        return '%s %s %s' % (lhs, self.operator, rhs), lhs_params + [self.rhs]
+
+
+class HStoreHasKey(HStoreKeyLookupMixin, Lookup):
+    lookup_name = 'has_key'
+    operator = '?'
+    many = False
+
+
+class HStoreHasKeys(HStoreKeyLookupMixin, Lookup):
+    lookup_name = 'has_keys'
+    operator = '?&'
+
+
+class HStoreHasAnyKeys(HStoreKeyLookupMixin, Lookup):
+    lookup_name = 'has_any_keys'
+    operator = '?|'
+
+
+class HStoreReferences(Lookup):
+    """
+    Finds the rows of a ``ReferencesField`` which reference the specified
+    instance(s); can use a GIN index on ``avals(column)``
+    (see ``django_hstore.operations.AddReferencesIndex``).
+    """
+    lookup_name = 'references'
+
+    def get_prep_lookup(self):
+        values = self.rhs if isinstance(self.rhs, (list, tuple)) else [self.rhs]
+        compact = getattr(self.lhs.output_field, 'compact', False)
+        references = []
+        for value in values:
+            if isinstance(value, six.string_types):
+                references.append(value)
+                continue
+            references.append(identify_instance(value))
+            # rows written before enabling compact references
+            # might still contain the full path
+            if compact:
+                references.append(identify_instance(value, compact=True))
+        return references
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        if not self.rhs:
+            raise ValueError('invalid value')
+        return 'avals(%s) && %%s::text[]' % lhs, lhs_params + [self.rhs]
+
+
+class KeyTransform(Transform):
+    """
+    Value of a key: ``data__price='10'``, ``data__price__contains='1'``.
+    """
+    output_field = models.TextField()
+
+    def __init__(self, key_name, *args, **kwargs):
+        super(KeyTransform, self).__init__(*args, **kwargs)
+        self.key_name = key_name
+
+    def as_sql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        return get_key_sql(lhs), list(params) + [self.key_name]
+
+
+class KeyTransformFactory(object):
+
+    def __init__(self, key_name):
+        self.key_name = key_name
+
+    def __call__(self, *args, **kwargs):
+        return KeyTransform(self.key_name, *args, **kwargs)
+
+
+class KeyCastTransform(Transform):
+    """
+    Casts the value of a key: ``data__price__int__gt=10``.
+    """
+    cast = None
+
+    def as_sql(self, compiler, connection):
+        lhs, params = compiler.compile(self.lhs)
+        return '%s::%s' % (lhs, self.cast), params
+
+
+KEY_CAST_OUTPUT_FIELDS = {
+    'int': models.BigIntegerField,
+    'float': models.FloatField,
+    'numeric': models.DecimalField,
+    'bool': models.NullBooleanField,
+    'date': models.DateField,
+    'timestamp': models.DateTimeField,
+    'time': models.TimeField,
+    'text': models.TextField,
+}
+
+for name, cast in KEY_CASTS.items():
+    KeyTransform.register_lookup(type(str('%sKeyTransform' % name.capitalize()), (KeyCastTransform,), {
+        'lookup_name': name,
+        'cast': cast,
+        'output_field': KEY_CAST_OUTPUT_FIELDS[name]()
+    }))
+
+
+def hstore_key(field_name, key, cast=None):
+    """
+    Returns the expression of the value of a key, which can be used
+    in ``annotate()`` (and then ``order_by()``, ``values()``, ecc):
+    ``Something.objects.annotate(price=hstore_key('data', 'price', 'int'))``.
+    Transforms can be used as expressions only since django 1.9.
+    """
+    if DJANGO_VERSION[:2] < (1, 9):
+        raise NotImplementedError('hstore_key requires django >= 1.9')
+    expression = KeyTransform(key, models.F(field_name))
+    if cast is not None:
+        if cast not in KEY_CASTS:
+            raise ValueError('invalid cast')
+        expression = expression.get_transform(cast)(expression)
+    return expression
@@ -0,0 +1,59 @@
+from __future__ import unicode_literals, absolute_import
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from django_hstore.fields import ReferencesField
+from django_hstore.query import HStoreQuerySet
+from django_hstore.utils import format_reference, parse_reference
+
+
+class Command(BaseCommand):
+    help = ('Rewrites the references stored in a ReferencesField using the format '
+            'configured on the field ("content_type_id:pk" if compact, "module.Model:pk" otherwise).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='model in the form app_label.ModelName')
+        parser.add_argument('field', help='name of the ReferencesField')
+        parser.add_argument('--batch-size', type=int, default=1000, dest='batch_size',
+                            help='number of rows processed in each transaction')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, dest='database')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        field = model._meta.get_field(options['field'])
+        if not isinstance(field, ReferencesField):
+            raise CommandError('%s is not a ReferencesField' % options['field'])
+        database = options['database']
+        queryset = HStoreQuerySet(model, using=database).order_by('pk')
+        last_pk = None
+        rewritten = 0
+        invalid = 0
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(batch.values_list('pk', field.attname)[:options['batch_size']])
+            if not rows:
+                break
+            updates = {}
+            for pk, references in rows:
+                changes = {}
+                for key, reference in (references or {}).items():
+                    try:
+                        ref_model, identifier = parse_reference(reference)
+                    except ValueError:
+                        invalid += 1
+                        continue
+                    value = format_reference(ref_model, identifier, compact=field.compact)
+                    if value != reference:
+                        changes[key] = value
+                if changes:
+                    updates[pk] = changes
+            # one statement for the whole batch
+            rewritten += queryset.bulk_hupdate(field.name, updates, batch_size=len(rows))
+            last_pk = rows[-1][0]
+            self.stdout.write('processed rows up to pk %s' % last_pk)
+        self.stdout.write('%d rows rewritten, %d invalid references skipped' % (rewritten, invalid))
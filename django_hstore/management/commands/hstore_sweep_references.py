@@ -0,0 +1,109 @@
+from __future__ import unicode_literals, absolute_import
+
+import time
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from django_hstore.fields import ReferencesField
+from django_hstore.query import HStoreQuerySet
+from django_hstore.utils import parse_reference
+
+
+class Command(BaseCommand):
+    help = ('Removes from a ReferencesField the keys which reference instances that do not exist anymore. '
+            'Rows are processed in batches ordered by pk, the last pk processed is printed after each '
+            'batch so an interrupted run can be resumed with --start-pk.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('model', help='model in the form app_label.ModelName')
+        parser.add_argument('field', help='name of the ReferencesField')
+        parser.add_argument('--batch-size', type=int, default=1000, dest='batch_size',
+                            help='number of rows processed in each transaction')
+        parser.add_argument('--start-pk', default=None, dest='start_pk',
+                            help='only process the rows with a pk greater than this one')
+        parser.add_argument('--sleep', type=float, default=0, dest='sleep',
+                            help='seconds to wait between batches')
+        parser.add_argument('--dry-run', action='store_true', default=False, dest='dry_run',
+                            help='only report the dangling references')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, dest='database')
+
+    def handle(self, *args, **options):
+        try:
+            model = apps.get_model(options['model'])
+        except (LookupError, ValueError) as e:
+            raise CommandError(e)
+        field = model._meta.get_field(options['field'])
+        if not isinstance(field, ReferencesField):
+            raise CommandError('%s is not a ReferencesField' % options['field'])
+        database = options['database']
+        queryset = HStoreQuerySet(model, using=database).order_by('pk')
+        last_pk = options['start_pk']
+        swept = 0
+        invalid = 0
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            removals, batch_invalid = self.find_dangling(self.fetch_references(model, field, pks, database),
+                                                         database)
+            invalid += batch_invalid
+            if removals and not options['dry_run']:
+                # only the pairs which have not changed in the meantime are removed
+                queryset.bulk_hremove(field.name, removals, batch_size=len(removals))
+            swept += sum(len(pairs) for pairs in removals.values())
+            last_pk = pks[-1]
+            self.stdout.write('processed rows up to pk %s' % last_pk)
+            if options['sleep']:
+                time.sleep(options['sleep'])
+        self.stdout.write('%d dangling references %s, %d invalid references skipped' % (
+            swept, 'found' if options['dry_run'] else 'removed', invalid))
+
+    def fetch_references(self, model, field, pks, database):
+        """
+        returns a ``(pk, key, reference)`` tuple for each reference stored in
+        the specified rows, the pairs are extracted by the database with ``each()``
+        """
+        connection = connections[database]
+        qn = connection.ops.quote_name
+        pk_field = model._meta.pk
+        sql = (
+            'SELECT "_pk", ("_item").key, ("_item").value FROM '
+            '(SELECT %s AS "_pk", each(%s) AS "_item" FROM %s WHERE %s IN %%s) AS items'
+        ) % (qn(pk_field.column), qn(field.column), qn(model._meta.db_table), qn(pk_field.column))
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [tuple(pk_field.get_db_prep_value(pk, connection) for pk in pks)])
+            return cursor.fetchall()
+
+    def find_dangling(self, items, database):
+        """
+        returns a dictionary which maps the pk of the rows to the pairs
+        referencing missing instances and the number of invalid references
+        """
+        identifiers = {}
+        invalid = 0
+        for pk, key, reference in items:
+            try:
+                ref_model, identifier = parse_reference(reference)
+                # non canonical identifiers (eg: '01') match the same rows as the canonical ones
+                identifier = ref_model._meta.pk.to_python(identifier)
+            except (ValueError, ValidationError):
+                invalid += 1
+                continue
+            identifiers.setdefault(ref_model, {}).setdefault(identifier, []).append((pk, key, reference))
+        removals = {}
+        for ref_model, pairs_by_identifier in identifiers.items():
+            try:
+                existing = set(ref_model._default_manager.using(database).filter(
+                    pk__in=list(pairs_by_identifier.keys())).values_list('pk', flat=True))
+            except (ValueError, TypeError):
+                invalid += sum(len(pairs) for pairs in pairs_by_identifier.values())
+                continue
+            for identifier, pairs in pairs_by_identifier.items():
+                if identifier not in existing:
+                    for pk, key, reference in pairs:
+                        removals.setdefault(pk, {})[key] = reference
+        return removals, invalid
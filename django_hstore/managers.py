@@ -20,12 +20,48 @@ class HStoreManager(models.Manager):
     def hkeys(self, attr, **params):
         return self.filter(**params).hkeys(attr)
 
+    def hkeys_iter(self, attr, chunk_size=2000, **params):
+        return self.filter(**params).hkeys_iter(attr, chunk_size)
+
+    def hitems_iter(self, attr, chunk_size=2000, **params):
+        return self.filter(**params).hitems_iter(attr, chunk_size)
+
+    def hkey_catalog(self, attr, counts=False, sample=None, cache_timeout=None, **params):
+        return self.filter(**params).hkey_catalog(attr, counts, sample, cache_timeout)
+
     def hpeek(self, attr, key, **params):
         return self.filter(**params).hpeek(attr, key)
 
+    def hpeek_many(self, attr, key, **params):
+        return self.filter(**params).hpeek_many(attr, key)
+
     def hslice(self, attr, keys, **params):
         return self.filter(**params).hslice(attr, keys)
 
+    def hslice_values(self, attr, keys, chunk_size=2000, **params):
+        return self.filter(**params).hslice_values(attr, keys, chunk_size)
+
+    def bulk_hupdate(self, attr, updates, batch_size=1000):
+        return self.get_queryset().bulk_hupdate(attr, updates, batch_size)
+
+    def bulk_hremove(self, attr, keys, batch_size=1000):
+        return self.get_queryset().bulk_hremove(attr, keys, batch_size)
+
+    def hincrement(self, attr, increments, returning=False, **params):
+        return self.filter(**params).hincrement(attr, increments, returning)
+
+    def hmutate(self, attr, **params):
+        return self.filter(**params).hmutate(attr)
+
+    def bulk_upsert(self, objs, conflict_fields, merge_fields=('data',), batch_size=1000):
+        return self.get_queryset().bulk_upsert(objs, conflict_fields, merge_fields, batch_size)
+
+    def only_keys(self, attr, keys):
+        return self.get_queryset().only_keys(attr, keys)
+
+    def prefetch_references(self, *attrs, **kwargs):
+        return self.get_queryset().prefetch_references(*attrs, **kwargs)
+
 
 if GEODJANGO_INSTALLED:
     from django.contrib.gis.db import models as geo_models
@@ -0,0 +1,175 @@
+from __future__ import unicode_literals, absolute_import
+
+from django.db.migrations.operations.base import Operation
+from django.utils import six
+
+from .utils import KEY_CASTS, get_key_sql
+
+
+__all__ = [
+    'AddHStoreIndex',
+    'AddHStoreKeyIndex',
+    'AddReferencesIndex',
+    'schema_key_indexes',
+]
+
+
+class HStoreIndexOperation(Operation):
+    """
+    base class of the operations creating an index on an hstore column;
+    subclasses define ``get_default_name`` and ``get_index_sql``.
+    ``concurrently=True`` builds the index without locking the table,
+    which postgres only allows outside of a transaction:
+    the migration must be declared with ``atomic = False``.
+    """
+    reversible = True
+
+    def __init__(self, model_name, field_name, name=None, concurrently=False):
+        self.model_name = model_name
+        self.field_name = field_name
+        self.name = name
+        self.concurrently = concurrently
+
+    def state_forwards(self, app_label, state):
+        pass
+
+    def get_index_name(self, model, schema_editor):
+        if self.name:
+            return self.name
+        column = model._meta.get_field(self.field_name).column
+        return self.get_default_name(model, column, schema_editor)
+
+    def get_default_name(self, model, column, schema_editor):
+        raise NotImplementedError
+
+    def get_index_sql(self, column, schema_editor):
+        """
+        returns the method and the expression of the index
+        """
+        raise NotImplementedError
+
+    def _should_migrate(self, schema_editor, model):
+        return schema_editor.connection.vendor == 'postgresql' and \
+            self.allow_migrate_model(schema_editor.connection.alias, model)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if not self._should_migrate(schema_editor, model):
+            return
+        column = model._meta.get_field(self.field_name).column
+        method, expression = self.get_index_sql(schema_editor.quote_name(column), schema_editor)
+        schema_editor.execute('CREATE INDEX %s%s ON %s USING %s (%s)' % (
+            'CONCURRENTLY ' if self.concurrently else '',
+            schema_editor.quote_name(self.get_index_name(model, schema_editor)),
+            schema_editor.quote_name(model._meta.db_table),
+            method,
+            expression
+        ))
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if not self._should_migrate(schema_editor, model):
+            return
+        schema_editor.execute('DROP INDEX %sIF EXISTS %s' % (
+            'CONCURRENTLY ' if self.concurrently else '',
+            schema_editor.quote_name(self.get_index_name(model, schema_editor))
+        ))
+
+
+class AddHStoreIndex(HStoreIndexOperation):
+    """
+    Creates a GIN or GiST index on an hstore column, which is used by the
+    ``contains``, ``gin_contains`` and ``has_key`` family of lookups.
+    """
+    methods = ('gin', 'gist')
+
+    def __init__(self, model_name, field_name, method='gin', name=None, concurrently=False):
+        if method not in self.methods:
+            raise ValueError('method must be one of: %s' % ', '.join(self.methods))
+        super(AddHStoreIndex, self).__init__(model_name, field_name, name=name, concurrently=concurrently)
+        self.method = method
+
+    def get_default_name(self, model, column, schema_editor):
+        return schema_editor._create_index_name(model, [column], suffix='_%s' % self.method)
+
+    def get_index_sql(self, column, schema_editor):
+        return self.method, column
+
+    def describe(self):
+        return 'Create %s index on %s.%s' % (self.method.upper(), self.model_name, self.field_name)
+
+
+class AddHStoreKeyIndex(HStoreIndexOperation):
+    """
+    Creates a btree index on the value of a single key of an hstore column,
+    optionally casted (see ``utils.KEY_CASTS``). The expression is the one
+    emitted by the lookups and key transforms, eg: ``cast='int'`` is used by
+    ``data__price__int__gt=1`` and ``data__gt={'price': 1}``.
+    """
+    def __init__(self, model_name, field_name, key, cast=None, name=None, concurrently=False):
+        if cast is not None and cast not in KEY_CASTS:
+            raise ValueError('cast must be one of: %s' % ', '.join(KEY_CASTS))
+        super(AddHStoreKeyIndex, self).__init__(model_name, field_name, name=name, concurrently=concurrently)
+        self.key = key
+        self.cast = cast
+
+    def get_default_name(self, model, column, schema_editor):
+        return schema_editor._create_index_name(model, [column, self.key], suffix='_key')
+
+    def get_index_sql(self, column, schema_editor):
+        key_sql = get_key_sql(column, KEY_CASTS.get(self.cast))
+        # postgres requires expressions other than function calls to be parenthesized
+        return 'btree', '(%s)' % (key_sql % schema_editor.quote_value(self.key))
+
+    def describe(self):
+        return 'Create index on the %s key of %s.%s' % (self.key, self.model_name, self.field_name)
+
+
+class AddReferencesIndex(HStoreIndexOperation):
+    """
+    Creates a GIN index on the values of a ``ReferencesField``,
+    which is used by the ``references`` lookup.
+    """
+    def get_default_name(self, model, column, schema_editor):
+        return schema_editor._create_index_name(model, [column], suffix='_avals')
+
+    def get_index_sql(self, column, schema_editor):
+        return 'gin', 'avals(%s)' % column
+
+    def describe(self):
+        return 'Create GIN index on the values of %s.%s' % (self.model_name, self.field_name)
+
+
+# casts of the lookups on the virtual fields of a schema (see ``utils.get_cast_for_param``)
+SCHEMA_CASTS = {
+    'IntegerField': 'int',
+    'BigIntegerField': 'int',
+    'SmallIntegerField': 'int',
+    'PositiveIntegerField': 'int',
+    'PositiveSmallIntegerField': 'int',
+    'FloatField': 'float',
+    'DecimalField': 'numeric',
+    'BooleanField': 'bool',
+    'NullBooleanField': 'bool',
+    'DateField': 'date',
+    'DateTimeField': 'timestamp',
+    'TimeField': 'time',
+}
+
+
+def schema_key_indexes(model_name, field_name, schema, concurrently=False):
+    """
+    returns an ``AddHStoreKeyIndex`` operation for each field of
+    a ``DictionaryField`` schema which is declared with ``db_index=True``
+    """
+    operations = []
+    for field in schema:
+        if not field.get('kwargs', {}).get('db_index'):
+            continue
+        field_class = field['class']
+        if not isinstance(field_class, six.string_types):
+            field_class = field_class.__name__
+        operations.append(AddHStoreKeyIndex(model_name, field_name, field['name'],
+                                            cast=SCHEMA_CASTS.get(field_class),
+                                            concurrently=concurrently))
+    return operations
@@ -1,18 +1,28 @@
 from __future__ import absolute_import, unicode_literals
 
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from hashlib import md5
+from uuid import uuid4
+
 import django
-from django.db import transaction
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections, transaction
 from django.db.models.query import QuerySet
 from django.db.models.query_utils import QueryWrapper
-from django.db.models.sql.constants import SINGLE
+from django.db.models.sql.constants import GET_ITERATOR_CHUNK_SIZE, MULTI, SINGLE
 from django.db.models.sql.datastructures import EmptyResultSet
 from django.db.models.sql.query import Query
 from django.db.models.sql.subqueries import UpdateQuery
 from django.db.models.sql.where import WhereNode
 from django.utils import six
+from django.utils.encoding import force_bytes
 
 from django_hstore.apps import GEODJANGO_INSTALLED
-from django_hstore.utils import get_cast_for_param, get_value_annotations
+from django_hstore.utils import acquire_references, get_cast_for_param, get_value_annotations
 
 try:
     # django <= 1.8
@@ -21,6 +31,13 @@ except ImportError:
     # django >= 1.9
     EmptyShortCircuit = Exception
 
+try:
+    # django >= 1.9
+    from django.db.models.query import ModelIterable
+except ImportError:
+    # django <= 1.8
+    ModelIterable = None
+
 
 def get_field(self, name):
     if django.VERSION >= (1, 8):
@@ -38,6 +55,103 @@ def select_query(method):
     return selector
 
 
+def stream_query(sql, params, using, chunk_size):
+    """
+    Executes the specified query through a server-side cursor
+    and yields its rows, fetching ``chunk_size`` rows at a time.
+    The cursor is declared ``WITH HOLD`` so that no transaction is kept
+    open while iterating (outside of a transaction the result is
+    materialized by the server before the first row is returned).
+    """
+    connection = connections[using]
+    connection.ensure_connection()
+    cursor = connection.connection.cursor(name='hstore_%s' % uuid4().hex, withhold=True)
+    cursor.itersize = chunk_size
+    try:
+        cursor.execute(sql, params)
+        for row in cursor:
+            yield row
+    finally:
+        cursor.close()
+
+
+def get_catalog_cache_alias():
+    """
+    returns the alias of the cache used for the key catalogs,
+    ``None`` (default) disables the caching and the invalidation
+    """
+    return getattr(settings, 'DJANGO_HSTORE_CATALOG_CACHE', None)
+
+
+def get_catalog_cache():
+    alias = get_catalog_cache_alias()
+    if alias is None:
+        raise ImproperlyConfigured('set DJANGO_HSTORE_CATALOG_CACHE to cache the key catalogs')
+    return caches[alias]
+
+
+def get_catalog_generation_key(model):
+    return 'django_hstore:catalog:%s.%s:generation' % (model._meta.app_label, model._meta.model_name)
+
+
+def get_catalog_generation(model):
+    """
+    returns the current generation of the cached key catalogs of the specified model
+    """
+    cache = get_catalog_cache()
+    key = get_catalog_generation_key(model)
+    generation = cache.get(key)
+    if generation is None:
+        # start from a value which has not been used before,
+        # the key might have been evicted from the cache
+        cache.add(key, int(time.time() * 1000000), None)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_catalog(model, using):
+    """
+    invalidates the cached key catalogs of the specified model once the
+    current transaction (if any) is committed, so that the catalogs read
+    in the meantime are not cached under the new generation;
+    does nothing if the catalogs are not cached
+    """
+    if get_catalog_cache_alias() is None:
+        return
+
+    def invalidate():
+        try:
+            get_catalog_cache().incr(get_catalog_generation_key(model))
+        except ValueError:
+            # no catalog has been cached
+            pass
+
+    if hasattr(transaction, 'on_commit'):
+        # django >= 1.9
+        transaction.on_commit(invalidate, using=using)
+    else:
+        invalidate()
+
+
+def get_increment_sql(column, increments):
+    """
+    returns the expression (and its params) which adds the specified amounts
+    to the numeric values of the keys in the column, missing keys count as 0
+    """
+    keys = list(increments.keys())
+    values = ', '.join(['(COALESCE(%s -> %%s, \'0\')::numeric + %%s)::text' % column] * len(keys))
+    params = [keys]
+    for key in keys:
+        params.extend([key, increments[key]])
+    return 'hstore(%%s::text[], ARRAY[%s])' % values, params
+
+
+def to_number(value):
+    if value is None:
+        return value
+    return Decimal(value) if '.' in value or 'e' in value.lower() else int(value)
+
+
 def update_query(method):
     def updater(self, *args, **params):
         self._for_write = True
@@ -45,6 +159,7 @@ def update_query(method):
         with transaction.atomic(using=self.db):
             rows = query.get_compiler(self.db).execute_sql(None)
         self._result_cache = None
+        invalidate_catalog(self.model, self.db)
         return rows
     updater.alters_data = True
     return updater
@@ -102,10 +217,12 @@ class HStoreWhereNode(WhereNode):
                     sign = (lookup_type[0] == 'g' and '>%s' or '<%s') % (lookup_type[-1] == 'e' and '=' or '')
                     param_keys = list(param.keys())
                     conditions = []
+                    params = []
                     for key in param_keys:
                         cast = get_cast_for_param(value_annot, key)
-                        conditions.append('(%s->\'%s\')%s %s %%s' % (field, key, cast, sign))
-                    return (" AND ".join(conditions), param.values())
+                        conditions.append('(%s->%%s::text)%s %s %%s' % (field, cast, sign))
+                        params.extend([key, param[key]])
+                    return (" AND ".join(conditions), params)
                 raise ValueError('invalid value')
             elif lookup_type in ['contains', 'icontains']:
                 if isinstance(param, dict):
@@ -113,11 +230,11 @@ class HStoreWhereNode(WhereNode):
                     keys = list(param.keys())
                     if len(values) == 1 and isinstance(values[0], (list, tuple)):
                         # Can't cast here because the list could contain multiple types
-                        return ('%s->\'%s\' = ANY(%%s)' % (field, keys[0]), [[str(x) for x in values[0]]])
+                        return ('%s->%%s::text = ANY(%%s)' % field, [keys[0], [str(x) for x in values[0]]])
                     elif len(keys) == 1 and len(values) == 1:
                         # Retrieve key and compare to param instead of using '@>' in order to cast hstore value
                         cast = get_cast_for_param(value_annot, keys[0])
-                        return ('(%s->\'%s\')%s = %%s' % (field, keys[0], cast), [values[0]])
+                        return ('(%s->%%s::text)%s = %%s' % (field, cast), [keys[0], values[0]])
                     return ('%s @> %%s' % field, [param])
                 elif isinstance(param, (list, tuple)):
                     if len(param) == 0:
@@ -145,8 +262,8 @@ class HStoreWhereNode(WhereNode):
                     conditions = []
                     for key in param_keys:
                         op = 'IS NULL' if value_annot[key] else 'IS NOT NULL'
-                        conditions.append('(%s->\'%s\') %s' % (field, key, op))
-                    return (" AND ".join(conditions), [])
+                        conditions.append('(%s->%%s::text) %s' % (field, op))
+                    return (" AND ".join(conditions), param_keys)
                 # do not perform any special format
                 return super(HStoreWhereNode, self).make_atom(child, qn, connection)
             else:
@@ -155,6 +272,76 @@ class HStoreWhereNode(WhereNode):
     make_hstore_atom = make_atom
 
 
+class HStoreMutation(object):
+    """
+    Collects several changes of an hstore which are executed
+    with a single UPDATE (see ``HStoreQuerySet.hmutate``).
+    Keys are removed first, then set and finally incremented.
+    """
+    def __init__(self, queryset, attr):
+        self.queryset = queryset
+        self.field = get_field(queryset, attr)
+        self.removed = []
+        self.updates = {}
+        self.increments = {}
+
+    def remove(self, keys):
+        if not isinstance(keys, (list, tuple, set)):
+            keys = [keys]
+        for key in keys:
+            self.updates.pop(key, None)
+            self.increments.pop(key, None)
+            if key not in self.removed:
+                self.removed.append(key)
+        return self
+
+    def set(self, updates):
+        for key, value in updates.items():
+            self.increments.pop(key, None)
+            if key in self.removed:
+                self.removed.remove(key)
+            self.updates[key] = value
+        return self
+
+    def incr(self, increments):
+        for key, delta in increments.items():
+            if key in self.updates:
+                if not isinstance(self.updates[key], six.integer_types + (float, Decimal)):
+                    raise ValueError('the key "%s" has already been set' % key)
+                self.updates[key] += delta
+            elif key in self.removed:
+                # removed by this mutation, counts as 0
+                self.removed.remove(key)
+                self.updates[key] = delta
+            else:
+                self.increments[key] = self.increments.get(key, 0) + delta
+        return self
+
+    def as_sql(self):
+        column = '"%s"' % self.field.column
+        sql = 'COALESCE(%s, \'\'::hstore)' % column
+        params = []
+        if self.removed:
+            sql = 'delete(%s, %%s::text[])' % sql
+            params.append(list(self.removed))
+        if self.updates:
+            sql = '%s || %%s' % sql
+            params.append(self.field.get_prep_value(dict(self.updates)))
+        if self.increments:
+            increment_sql, increment_params = get_increment_sql(column, self.increments)
+            sql = '%s || %s' % (sql, increment_sql)
+            params.extend(increment_params)
+        return sql, params
+
+    def execute(self):
+        """
+        Runs the UPDATE and returns the number of rows updated.
+        """
+        if not (self.removed or self.updates or self.increments):
+            return 0
+        return self.queryset._hupdate_value(self.field, QueryWrapper(*self.as_sql()))
+
+
 class HStoreQuery(Query):
     def __init__(self, model):
         super(HStoreQuery, self).__init__(model, HStoreWhereNode)
@@ -164,6 +351,112 @@ class HStoreQuerySet(QuerySet):
     def __init__(self, model=None, query=None, using=None, *args, **kwargs):
         query = query or HStoreQuery(model)
         super(HStoreQuerySet, self).__init__(model=model, query=query, using=using, *args, **kwargs)
+        self._prefetch_references = ()
+        self._references_chunk_size = GET_ITERATOR_CHUNK_SIZE
+        self._only_keys = ()
+
+    def _clone(self, *args, **kwargs):
+        clone = super(HStoreQuerySet, self)._clone(*args, **kwargs)
+        clone._prefetch_references = self._prefetch_references
+        clone._references_chunk_size = self._references_chunk_size
+        clone._only_keys = self._only_keys
+        return clone
+
+    def iterator(self):
+        iterator = super(HStoreQuerySet, self).iterator()
+        # values(), values_list() and so on are left alone
+        if getattr(self, '_iterable_class', None) is not ModelIterable:
+            return iterator
+        if self._only_keys:
+            iterator = self._iterator_with_partial_values(iterator)
+        if self._prefetch_references:
+            iterator = self._iterator_with_references(iterator)
+        return iterator
+
+    def _iterator_with_partial_values(self, iterator):
+        fields = [get_field(self, attr) for attr in self._only_keys]
+        for obj in iterator:
+            for field in fields:
+                raw = obj.__dict__.pop(self._only_keys_alias(field))
+                if raw is None:
+                    value = None
+                else:
+                    value = field._dict_from_db(raw)
+                    value.instance = obj
+                    value.schema_mode = field.schema_mode
+                    value._mark_partial()
+                # bypasses the descriptor which would treat
+                # the value as a replacement of the stored one
+                obj.__dict__[field.name] = value
+            yield obj
+
+    def _only_keys_alias(self, field):
+        return '_%s_only_keys' % field.attname
+
+    def only_keys(self, attr, keys):
+        """
+        Loads only the specified keys of a ``DictionaryField``, the
+        resulting dictionaries are partial: when the instances are saved
+        the changes are merged into the stored value.
+        """
+        from .fields import DictionaryField
+        field = get_field(self, attr)
+        if not isinstance(field, DictionaryField):
+            raise ValueError('only_keys() supports DictionaryField only')
+        qn = connections[self.db].ops.quote_name
+        clone = self.defer(attr)
+        clone.query.add_extra({
+            self._only_keys_alias(field): 'slice(%s.%s, %%s)' % (qn(self.model._meta.db_table), qn(field.column))
+        }, [list(keys)], None, None, None, None)
+        if attr not in clone._only_keys:
+            clone._only_keys = clone._only_keys + (attr,)
+        return clone
+
+    def _iterator_with_references(self, iterator):
+        chunk = []
+        for obj in iterator:
+            chunk.append(obj)
+            if len(chunk) >= self._references_chunk_size:
+                self._resolve_references(chunk)
+                for obj in chunk:
+                    yield obj
+                chunk = []
+        self._resolve_references(chunk)
+        for obj in chunk:
+            yield obj
+
+    def _resolve_references(self, objs):
+        """
+        resolves the references of all the specified objects
+        with one query for each referenced model
+        """
+        dictionaries = []
+        references = set()
+        for attr in self._prefetch_references:
+            for obj in objs:
+                value = getattr(obj, attr)
+                if value:
+                    dictionaries.append(value)
+                    references.update(value.unresolved_references().values())
+        if not references:
+            return
+        instances = acquire_references(references)
+        for value in dictionaries:
+            value.resolve_all(instances)
+
+    def prefetch_references(self, *attrs, **kwargs):
+        """
+        Resolves the references stored in the specified ``ReferencesField``
+        attributes with one query for each referenced model every ``chunk_size`` rows.
+        Passing ``None`` clears the list of attributes.
+        """
+        clone = self._clone()
+        if attrs == (None,):
+            clone._prefetch_references = ()
+        else:
+            clone._prefetch_references = self._prefetch_references + attrs
+        clone._references_chunk_size = kwargs.get('chunk_size', self._references_chunk_size)
+        return clone
 
     @select_query
     def hkeys(self, query, attr):
@@ -174,6 +467,93 @@ class HStoreQuerySet(QuerySet):
         result = query.get_compiler(self.db).execute_sql(SINGLE)
         return (result[0] if result else [])
 
+    def _pk_select(self):
+        qn = connections[self.db].ops.quote_name
+        return '%s.%s' % (qn(self.model._meta.db_table), qn(self.model._meta.pk.column))
+
+    @select_query
+    def hkeys_iter(self, query, attr, chunk_size=2000):
+        """
+        Streams a ``(pk, keys)`` tuple for each row through a server-side cursor.
+        """
+        query.add_extra(OrderedDict([('_pk', self._pk_select()), ('_', 'akeys("%s")' % attr)]),
+                        None, None, None, None, None)
+        try:
+            sql, params = query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return
+        for pk, keys in stream_query(sql, params, self.db, chunk_size):
+            yield pk, keys or []
+
+    @select_query
+    def hitems_iter(self, query, attr, chunk_size=2000):
+        """
+        Streams a ``(pk, key, value)`` tuple for each key of each row through a server-side cursor.
+        """
+        query.add_extra(OrderedDict([('_pk', self._pk_select()), ('_item', 'each("%s")' % attr)]),
+                        None, None, None, None, None)
+        try:
+            sql, params = query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return
+        # each() is evaluated once per row, the pairs are split by the outer query
+        sql = 'SELECT "_pk", ("_item").key, ("_item").value FROM (%s) AS items' % sql
+        field = get_field(self, attr)
+        for pk, key, value in stream_query(sql, params, self.db, chunk_size):
+            yield pk, key, field._value_to_python(value)
+
+    @select_query
+    def _hkey_catalog_sql(self, query, attr, counts, sample):
+        query.clear_ordering(True)
+        query.add_extra({'_': 'skeys("%s")' % attr}, None, None, None, None, None)
+        sql, params = query.get_compiler(self.db).as_sql()
+        if sample is not None:
+            table = connections[self.db].ops.quote_name(self.model._meta.db_table)
+            sql = sql.replace('FROM %s' % table, 'FROM %s TABLESAMPLE SYSTEM (%r)' % (table, float(sample)), 1)
+        if counts:
+            sql = 'SELECT "_", count(*) FROM (%s) AS catalog GROUP BY "_"' % sql
+        else:
+            sql = 'SELECT DISTINCT "_" FROM (%s) AS catalog' % sql
+        return sql, params
+
+    def hkey_catalog(self, attr, counts=False, sample=None, cache_timeout=None):
+        """
+        Returns the sorted list of the distinct keys present in the specified hstore,
+        or a dictionary which maps each key to the number of rows containing it if ``counts``.
+        ``sample`` is the percentage of the table read through ``TABLESAMPLE SYSTEM``,
+        counts are then estimated accordingly.
+        If ``cache_timeout`` is specified the result is cached for that many seconds in the
+        ``DJANGO_HSTORE_CATALOG_CACHE`` cache, the updates of the hstores of the model invalidate it.
+        """
+        try:
+            sql, params = self._hkey_catalog_sql(attr, counts, sample)
+        except EmptyResultSet:
+            return {} if counts else []
+        if cache_timeout is not None:
+            cache = get_catalog_cache()
+            key = 'django_hstore:catalog:%s.%s:%s:%s' % (
+                self.model._meta.app_label,
+                self.model._meta.model_name,
+                get_catalog_generation(self.model),
+                md5(force_bytes(repr((self.db, sql, params)))).hexdigest()
+            )
+            result = cache.get(key)
+            if result is None:
+                result = self._hkey_catalog(sql, params, counts, sample)
+                cache.set(key, result, cache_timeout)
+            return result
+        return self._hkey_catalog(sql, params, counts, sample)
+
+    def _hkey_catalog(self, sql, params, counts, sample):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        if not counts:
+            return sorted(row[0] for row in rows)
+        if sample is None:
+            return dict(rows)
+        return dict((key, int(round(count * 100.0 / sample))) for key, count in rows)
+
     @select_query
     def hpeek(self, query, attr, key):
         """
@@ -186,6 +566,21 @@ class HStoreQuerySet(QuerySet):
             field = get_field(self, attr)
             return field._value_to_python(result[0])
 
+    @select_query
+    def hpeek_many(self, query, attr, key):
+        """
+        Peeks at the value of the specified key in every row,
+        returns a dictionary which maps the pk of each row to the value.
+        """
+        query.add_extra(OrderedDict([('_pk', self._pk_select()), ('_', '"%s" -> %%s' % attr)]),
+                        [key], None, None, None, None)
+        field = get_field(self, attr)
+        result = {}
+        for rows in query.get_compiler(self.db).execute_sql(MULTI):
+            for pk, value in rows:
+                result[pk] = field._value_to_python(value) if value is not None else None
+        return result
+
     @select_query
     def hslice(self, query, attr, keys):
         """
@@ -198,6 +593,22 @@ class HStoreQuerySet(QuerySet):
             return dict((key, field._value_to_python(value)) for key, value in result[0].items())
         return {}
 
+    @select_query
+    def hslice_values(self, query, attr, keys, chunk_size=2000):
+        """
+        Streams a ``(pk, slice)`` tuple for each row through a server-side cursor,
+        where ``slice`` contains the specified key/value pairs.
+        """
+        query.add_extra(OrderedDict([('_pk', self._pk_select()), ('_', 'slice("%s", %%s)' % attr)]),
+                        [list(keys)], None, None, None, None)
+        field = get_field(self, attr)
+        try:
+            sql, params = query.get_compiler(self.db).as_sql()
+        except EmptyResultSet:
+            return
+        for pk, value in stream_query(sql, params, self.db, chunk_size):
+            yield pk, dict((key, field._value_to_python(item)) for key, item in (value or {}).items())
+
     @update_query
     def hremove(self, query, attr, keys):
         """
@@ -208,6 +619,230 @@ class HStoreQuerySet(QuerySet):
         query.add_update_fields([(field, None, value)])
         return query
 
+    def _bulk_update(self, attr, values, expression, cast, batch_size):
+        """
+        Updates each row with its own value through ``UPDATE ... FROM (VALUES ...)``,
+        ``values`` maps the pks to the values and ``expression`` combines
+        the column (``%(column)s``) with the value of the row (``v.value``).
+        """
+        assert self.query.can_filter(), 'Cannot update a query once a slice has been taken.'
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        pk_field = self.model._meta.pk
+        table = qn(self.model._meta.db_table)
+        column = qn(get_field(self, attr).column)
+        pk_column = '%s.%s' % (table, qn(pk_field.column))
+        head = 'UPDATE %s SET %s = %s FROM (VALUES ' % (
+            table, column, expression % {'column': '%s.%s' % (table, column)}
+        )
+        tail = ') AS v(pk, value) WHERE %s = v.pk' % pk_column
+        filter_params = []
+        if self.query.where:
+            try:
+                subquery, filter_params = self.order_by().values_list('pk').query.get_compiler(self.db).as_sql()
+            except EmptyResultSet:
+                return 0
+            tail = '%s AND %s IN (%s)' % (tail, pk_column, subquery)
+        values = list(values.items())
+        rows = 0
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                for start in range(0, len(values), batch_size):
+                    batch = values[start:start + batch_size]
+                    params = []
+                    for pk, value in batch:
+                        params.extend([pk_field.get_db_prep_value(pk, connection), value])
+                    cursor.execute(head + ', '.join(['(%%s, %%s%s)' % cast] * len(batch)) + tail,
+                                   params + list(filter_params))
+                    rows += cursor.rowcount
+        self._result_cache = None
+        invalidate_catalog(self.model, self.db)
+        return rows
+
+    def bulk_hupdate(self, attr, updates, batch_size=1000):
+        """
+        Merges a different dictionary into each row, ``updates`` maps the pks
+        to the dictionaries; runs one statement every ``batch_size`` rows
+        and returns the number of rows updated.
+        """
+        field = get_field(self, attr)
+        updates = dict((pk, field.get_prep_value(value)) for pk, value in updates.items())
+        return self._bulk_update(attr, updates, 'COALESCE(%(column)s, \'\'::hstore) || v.value',
+                                 '::hstore', batch_size)
+    bulk_hupdate.alters_data = True
+
+    def bulk_hremove(self, attr, keys, batch_size=1000):
+        """
+        Removes different keys from each row, ``keys`` maps the pks
+        to the lists of keys, or to dictionaries in which case only the keys
+        which still have the specified values are removed; runs one statement
+        every ``batch_size`` rows and returns the number of rows updated.
+        """
+        pairs = [isinstance(value, dict) for value in keys.values()]
+        if any(pairs):
+            if not all(pairs):
+                raise ValueError('keys must map all the pks either to lists of keys or to dictionaries')
+            field = get_field(self, attr)
+            keys = dict((pk, field.get_prep_value(value)) for pk, value in keys.items())
+            return self._bulk_update(attr, keys, 'delete(%(column)s, v.value)', '::hstore', batch_size)
+        keys = dict((pk, list(value) if isinstance(value, (list, tuple, set)) else [value])
+                    for pk, value in keys.items())
+        return self._bulk_update(attr, keys, 'delete(%(column)s, v.value)', '::text[]', batch_size)
+    bulk_hremove.alters_data = True
+
+    def hmutate(self, attr):
+        """
+        Returns an ``HStoreMutation`` which combines removals, updates and
+        increments of the specified hstore in a single statement.
+        """
+        return HStoreMutation(self, attr)
+
+    def hincrement(self, attr, increments, returning=False):
+        """
+        Adds the specified amounts to the numeric values of the specified keys
+        (missing keys count as 0) in a single statement; if ``returning``
+        a dictionary which maps the pk of each row to its new values is returned,
+        the number of rows updated otherwise.
+        """
+        if not increments:
+            return {} if returning else 0
+        field = get_field(self, attr)
+        column = '"%s"' % field.column
+        sql, params = get_increment_sql(column, increments)
+        value = QueryWrapper('COALESCE(%s, \'\'::hstore) || %s' % (column, sql), params)
+        if returning:
+            return self._hupdate_returning(field, value, list(increments.keys()))
+        return self._hupdate_value(field, value)
+    hincrement.alters_data = True
+
+    @update_query
+    def _hupdate_value(self, query, field, value):
+        query.add_update_fields([(field, None, value)])
+        return query
+
+    def _hupdate_returning(self, field, value, keys):
+        """
+        updates the field with the specified expression and returns the
+        new numeric values of the specified keys of each row
+        """
+        self._for_write = True
+        qn = connections[self.db].ops.quote_name
+        query = self.query.clone(UpdateQuery)
+        query.add_update_fields([(field, None, value)])
+        compiler = query.get_compiler(self.db)
+        try:
+            compiler.pre_sql_setup()
+            sql, params = compiler.as_sql()
+        except EmptyResultSet:
+            return {}
+        if not sql:
+            return {}
+        sql = '%s RETURNING %s, slice(%s, %%s)' % (sql, self._pk_select(), qn(field.column))
+        with transaction.atomic(using=self.db):
+            with connections[self.db].cursor() as cursor:
+                cursor.execute(sql, tuple(params) + (keys,))
+                rows = cursor.fetchall()
+        self._result_cache = None
+        invalidate_catalog(self.model, self.db)
+        return dict((pk, dict((key, to_number(item)) for key, item in values.items())) for pk, values in rows)
+
+    def bulk_upsert(self, objs, conflict_fields, merge_fields=('data',), batch_size=1000):
+        """
+        Inserts the specified objects with ``INSERT ... ON CONFLICT (conflict_fields) DO UPDATE``,
+        when a row already exists the hstores in ``merge_fields`` are merged into it.
+        Objects having the same values of ``conflict_fields`` are merged beforehand as if they
+        were upserted one after the other, postgres refuses to update a row twice in a statement.
+        Requires PostgreSQL 9.5 or later, returns the number of rows inserted or updated.
+        """
+        assert batch_size is None or batch_size > 0
+        objs = list(objs)
+        if not objs:
+            return 0
+        self._for_write = True
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        opts = self.model._meta
+        table = qn(opts.db_table)
+        conflict_fields = [get_field(self, name) for name in conflict_fields]
+        # the pk is generated by the database unless it's used to detect the conflicts
+        fields = [field for field in opts.concrete_fields
+                  if not (field.primary_key and field.get_internal_type() == 'AutoField') or field in conflict_fields]
+        head = 'INSERT INTO %s (%s) VALUES ' % (table, ', '.join(qn(field.column) for field in fields))
+        if merge_fields:
+            columns = [qn(get_field(self, name).column) for name in merge_fields]
+            action = 'DO UPDATE SET %s' % ', '.join(
+                '%s = COALESCE(%s.%s, \'\'::hstore) || COALESCE(EXCLUDED.%s, \'\'::hstore)' % (
+                    column, table, column, column)
+                for column in columns
+            )
+        else:
+            action = 'DO NOTHING'
+        tail = ' ON CONFLICT (%s) %s RETURNING %s' % (
+            ', '.join(qn(field.column) for field in conflict_fields), action, qn(opts.pk.column)
+        )
+        # unsaved objects get the pk generated by the database even if it's a conflict field
+        auto_index = None
+        if opts.pk in fields and opts.pk.get_internal_type() == 'AutoField':
+            auto_index = fields.index(opts.pk)
+        values = self._upsert_values(objs, fields, conflict_fields, merge_fields or (), connection)
+        batch_size = batch_size or len(values)
+        rows = 0
+        with transaction.atomic(using=self.db):
+            with connection.cursor() as cursor:
+                for start in range(0, len(values), batch_size):
+                    batch = values[start:start + batch_size]
+                    placeholders = []
+                    params = []
+                    for row_params, row_objs in batch:
+                        row_placeholders = ['%s'] * len(fields)
+                        if auto_index is not None and row_params[auto_index] is None:
+                            row_placeholders[auto_index] = 'DEFAULT'
+                            row_params = row_params[:auto_index] + row_params[auto_index + 1:]
+                        placeholders.append('(%s)' % ', '.join(row_placeholders))
+                        params.extend(row_params)
+                    cursor.execute(head + ', '.join(placeholders) + tail, params)
+                    pks = [row[0] for row in cursor.fetchall()]
+                    rows += len(pks)
+                    # rows are returned in the order of the values unless some
+                    # conflict is ignored (DO NOTHING), in which case pks are unknown
+                    if len(pks) == len(batch):
+                        for (row_params, row_objs), pk in zip(batch, pks):
+                            for obj in row_objs:
+                                obj.pk = pk
+                                obj._state.adding = False
+                                obj._state.db = self.db
+        self._result_cache = None
+        invalidate_catalog(self.model, self.db)
+        return rows
+    bulk_upsert.alters_data = True
+
+    def _upsert_values(self, objs, fields, conflict_fields, merge_fields, connection):
+        """
+        returns a ``(params, objs)`` tuple for each row to upsert: the objects
+        having the same values of the conflict fields are combined in one row,
+        which keeps the values of the first one and merges the hstores of all
+        """
+        conflict_indexes = [fields.index(field) for field in conflict_fields]
+        merge_indexes = [fields.index(get_field(self, name)) for name in merge_fields]
+        values = OrderedDict()
+        for obj in objs:
+            params = [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+            key = tuple(tuple(sorted(params[i].items())) if isinstance(params[i], dict) else params[i]
+                        for i in conflict_indexes)
+            # NULL values never conflict
+            if None in key:
+                key = object()
+            if key not in values:
+                values[key] = (params, [obj])
+                continue
+            row_params, row_objs = values[key]
+            for i in merge_indexes:
+                merged = dict(row_params[i] or {})
+                merged.update(params[i] or {})
+                row_params[i] = merged
+            row_objs.append(obj)
+        return list(values.values())
+
     @update_query
     def hupdate(self, query, attr, updates):
         """
@@ -1,17 +1,107 @@
 from __future__ import unicode_literals, absolute_import
 
+from collections import OrderedDict
 from decimal import Decimal
 from datetime import date, time, datetime
 
-from django.core.exceptions import ObjectDoesNotExist
+from django.apps import apps
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.utils import six
 
 
-def acquire_reference(reference):
+class _LookupFailure(object):
+    def __init__(self, error_class, args):
+        self.error_class = error_class
+        self.args = args
+
+
+class ReferenceResolver(object):
+    """
+    Maps the ``module.Model`` (or content type id) prefix of references to model classes.
+    The index of the models in the django app registry is built once and rebuilt only when
+    models are registered; resolved prefixes, and the errors raised by the prefixes which
+    can't be resolved, are kept in a cache of at most ``maxsize`` items.
+    """
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.misses = 0
+        self._cache = OrderedDict()
+        self._index = None
+        self._models = None
+
+    def get_model(self, path):
+        try:
+            model = self._cache[path]
+        except KeyError:
+            pass
+        else:
+            if not isinstance(model, _LookupFailure):
+                return model
+            # models registered since the failure might resolve the prefix
+            if apps.get_models() is self._models:
+                raise model.error_class(*model.args)
+            del self._cache[path]
+        self.misses += 1
+        try:
+            model = self._lookup(path)
+        except Exception as e:
+            # the exception itself is not kept, it references the frames of the lookup
+            self._store(path, _LookupFailure(type(e), e.args))
+            raise
+        self._store(path, model)
+        return model
+
+    def _store(self, path, value):
+        if len(self._cache) >= self.maxsize:
+            self._cache.popitem(last=False)
+        self._cache[path] = value
+
+    def _lookup(self, path):
+        # compact references are prefixed by the content type id
+        if path.isdigit():
+            from django.contrib.contenttypes.models import ContentType
+            model = ContentType.objects.get_for_id(int(path)).model_class()
+            if model is None:
+                raise LookupError('content type %s has no model' % path)
+            return model
+        # (re)build the index if models have been registered after the last build,
+        # the list returned by ``apps.get_models`` is cached until then
+        models = apps.get_models()
+        if models is not self._models:
+            self._index = dict(('%s.%s' % (model.__module__, model.__name__), model)
+                               for model in models)
+            self._models = models
+        try:
+            return self._index[path]
+        except KeyError:
+            # not a registered model, import it
+            module, sep, attr = path.rpartition('.')
+            return getattr(__import__(module, fromlist=(attr,)), attr)
+
+    def clear(self):
+        self._cache.clear()
+        self._index = None
+        self._models = None
+        self.misses = 0
+
+
+reference_resolver = ReferenceResolver()
+
+
+def parse_reference(reference):
+    """
+    returns the model class and the primary key of a reference
+    """
     try:
         model, identifier = reference.split(':')
-        module, sep, attr = model.rpartition('.')
-        model = getattr(__import__(module, fromlist=(attr,)), attr)
+        return reference_resolver.get_model(model), identifier
+    except Exception:
+        raise ValueError
+
+
+def acquire_reference(reference):
+    model, identifier = parse_reference(reference)
+    try:
         return model.objects.get(pk=identifier)
     except ObjectDoesNotExist:
         return None
@@ -19,12 +109,52 @@ def acquire_reference(reference):
         raise ValueError
 
 
-def identify_instance(instance):
-    model = type(instance)
-    return '%s.%s:%s' % (model.__module__, model.__name__, instance.pk)
+def acquire_references(references):
+    """
+    resolves many references by running one query for each referenced model,
+    returns a dictionary which maps each reference to its instance (or None);
+    invalid references are left out so that only accessing them fails
+    """
+    identifiers = {}
+    for reference in set(references):
+        try:
+            model, identifier = parse_reference(reference)
+            # non canonical identifiers (eg: '01') are matched by the pk of the instances
+            pk = model._meta.pk.to_python(identifier)
+        except (ValueError, ValidationError):
+            continue
+        identifiers.setdefault(model, {}).setdefault(pk, []).append(reference)
+    instances = {}
+    for model, references_by_pk in identifiers.items():
+        try:
+            queryset = list(model.objects.filter(pk__in=list(references_by_pk.keys())))
+        except (ValueError, TypeError):
+            continue
+        for pk_references in references_by_pk.values():
+            instances.update(dict.fromkeys(pk_references))
+        for instance in queryset:
+            for reference in references_by_pk.get(instance.pk, ()):
+                instances[reference] = instance
+    return instances
+
+
+def format_reference(model, identifier, compact=False):
+    """
+    returns the reference to a model instance, which is either
+    ``module.Model:pk`` or ``content_type_id:pk`` if ``compact`` is True
+    """
+    if compact:
+        from django.contrib.contenttypes.models import ContentType
+        content_type = ContentType.objects.get_for_model(model, for_concrete_model=False)
+        return '%s:%s' % (content_type.pk, identifier)
+    return '%s.%s:%s' % (model.__module__, model.__name__, identifier)
 
 
-def serialize_references(references):
+def identify_instance(instance, compact=False):
+    return format_reference(type(instance), instance.pk, compact=compact)
+
+
+def serialize_references(references, compact=False):
     refs = {}
     # if None or string return empty dict
     if references is None or isinstance(references, six.string_types):
@@ -33,7 +163,7 @@ def serialize_references(references):
     elif isinstance(references, dict):
         for key, instance in references.items():
             if not isinstance(instance, six.string_types):
-                refs[key] = identify_instance(instance)
+                refs[key] = identify_instance(instance, compact=compact)
             else:
                 refs[key] = instance
         else:
@@ -47,15 +177,44 @@ def unserialize_references(references):
     refs = {}
     if references is None:
         return refs
+    instances = acquire_references([reference for reference in references.values()
+                                    if isinstance(reference, six.string_types)])
     for key, reference in references.items():
         if isinstance(reference, six.string_types):
-            refs[key] = acquire_reference(reference)
+            # invalid references raise ValueError
+            refs[key] = instances[reference] if reference in instances else acquire_reference(reference)
         else:
             refs[key] = reference
     else:
         return refs
 
 
+# casts available for the values of the keys: name of the transform -> SQL type;
+# shared by the key transforms and the key indexes
+KEY_CASTS = OrderedDict([
+    ('int', 'bigint'),
+    ('float', 'float8'),
+    ('numeric', 'numeric'),
+    ('bool', 'boolean'),
+    ('date', 'date'),
+    ('timestamp', 'timestamp'),
+    ('time', 'time'),
+    ('text', 'text'),
+])
+
+
+def get_key_sql(column, cast=None):
+    """
+    returns the SQL of the value of a key of an hstore column, optionally casted;
+    the key is a parameter. Lookups, key transforms and key indexes all use this
+    shape so that the expressions of the queries match the ones of the indexes.
+    """
+    sql = '(%s -> %%s::text)' % column
+    if cast:
+        sql = '%s::%s' % (sql, cast)
+    return sql
+
+
 def get_cast_for_param(value_annot, key):
     if not isinstance(value_annot, dict):
         return ''
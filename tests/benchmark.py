@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+micro-benchmarks of the loading of hstore values and of the resolution
+of references, no database connection is needed:
+
+    python tests/benchmark.py [rows]
+"""
+from __future__ import print_function, unicode_literals
+
+import os
+import sys
+import timeit
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(TESTS_DIR))
+sys.path.insert(0, TESTS_DIR)
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "settings")
+
+
+def report(name, seconds, number):
+    print('%-44s %8.1f us' % (name, seconds * 1000000.0 / number))
+
+
+def main(rows=100000):
+    import django
+    django.setup()
+
+    from django_hstore.dict import HStoreDict
+    from django_hstore.utils import format_reference, parse_reference, reference_resolver
+    from django_hstore_tests.models import DataBag, Ref
+
+    field = DataBag._meta.get_field('data')
+    raw = dict(('key%d' % i, 'value%d' % i) for i in range(20))
+
+    # rows loaded from the database (20 keys per row)
+    report('HStoreDict(value=...) per row',
+           timeit.timeit(lambda: HStoreDict(value=dict(raw), field=field), number=rows), rows)
+    report('from_db_value per row',
+           timeit.timeit(lambda: field.from_db_value(dict(raw), None, None, None), number=rows), rows)
+    report('Model.from_db per row',
+           timeit.timeit(lambda: DataBag.from_db('default', ['id', 'name', 'data'], [
+               1, 'name', field.from_db_value(dict(raw), None, None, None)
+           ]), number=rows), rows)
+
+    # model class resolution of the references
+    reference = format_reference(Ref, 1)
+
+    def import_reference():
+        path, identifier = reference.split(':')
+        module, sep, attr = path.rpartition('.')
+        return getattr(__import__(module, fromlist=(attr,)), attr), identifier
+
+    reference_resolver.clear()
+    report('split + __import__ + getattr per reference', timeit.timeit(import_reference, number=rows), rows)
+    report('parse_reference (cached) per reference',
+           timeit.timeit(lambda: parse_reference(reference), number=rows), rows)
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
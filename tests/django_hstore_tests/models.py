@@ -10,8 +10,14 @@ __all__ = [
     'SerializedDataBag',
     'SerializedDataBagNoID',
     'NullableDataBag',
+    'TrackedDataBag',
+    'TrackedDataBagProxy',
+    'TrackedDataBagChild',
+    'LazyDataBag',
+    'GinDataBag',
     'RefsBag',
     'NullableRefsBag',
+    'CompactRefsBag',
     'DefaultsModel',
     'BadDefaultsModel',
     'DefaultsInline',
@@ -52,6 +58,30 @@ class NullableDataBag(HStoreModel):
     data = hstore.DictionaryField(null=True)
 
 
+class TrackedDataBag(HStoreModel):
+    name = models.CharField(max_length=32)
+    data = hstore.DictionaryField(track_changes=True)
+
+
+class TrackedDataBagProxy(TrackedDataBag):
+    class Meta:
+        proxy = True
+
+
+class TrackedDataBagChild(TrackedDataBag):
+    extra = models.CharField(max_length=32, blank=True)
+
+
+class LazyDataBag(HStoreModel):
+    name = models.CharField(max_length=32)
+    data = hstore.DictionaryField(lazy=True, track_changes=True)
+
+
+class GinDataBag(HStoreModel):
+    name = models.CharField(max_length=32)
+    data = hstore.DictionaryField(gin_contains=True)
+
+
 class RefsBag(HStoreModel):
     name = models.CharField(max_length=32)
     refs = hstore.ReferencesField()
@@ -62,6 +92,11 @@ class NullableRefsBag(HStoreModel):
     refs = hstore.ReferencesField(null=True, blank=True)
 
 
+class CompactRefsBag(HStoreModel):
+    name = models.CharField(max_length=32)
+    refs = hstore.ReferencesField(compact=True)
+
+
 class DefaultsModel(models.Model):
     a = hstore.DictionaryField(default={})
     b = hstore.DictionaryField(default=None, null=True)
@@ -8,26 +8,36 @@ from decimal import Decimal
 from django import VERSION as DJANGO_VERSION
 from django import forms
 from django.contrib.auth.models import User
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ImproperlyConfigured, ValidationError
 from django.core.urlresolvers import reverse
-from django.db import transaction
+from django.db import connection, models, transaction
+from django.db.migrations.state import ProjectState
 from django.db.models.aggregates import Count
-from django.db.utils import IntegrityError
+from django.db.models.signals import post_save
+from django.db.utils import DataError, IntegrityError
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.utils.encoding import force_text
 
 from django_hstore import get_version
 from django_hstore.exceptions import HStoreDictException
 from django_hstore.fields import HStoreDict
 from django_hstore.forms import DictionaryFieldWidget
+from django_hstore.lookups import hstore_key
+from django_hstore.operations import AddHStoreIndex, AddHStoreKeyIndex, schema_key_indexes
 from django_hstore.utils import get_cast_for_param
 
 from django_hstore_tests.models import (
     BadDefaultsModel,
     DataBag,
     DefaultsModel,
+    GinDataBag,
+    LazyDataBag,
     NullableDataBag,
     NumberedDataBag,
+    TrackedDataBag,
+    TrackedDataBagChild,
+    TrackedDataBagProxy,
     UniqueTogetherDataBag
 )
 
@@ -380,17 +390,246 @@ class TestDictionaryField(TestCase):
         with self.assertRaises(ValueError):
             DataBag.objects.filter(data__gte=99)[0]
 
+    def test_lookup_keys_are_parameters(self):
+        self._create_bags()
+        quoted = DataBag.objects.create(name='quoted', data={"it's": '1'})
+        self.assertEqual(DataBag.objects.get(data__contains={"it's": '1'}), quoted)
+        self.assertEqual(DataBag.objects.get(data__gte={"it's": 1}), quoted)
+        self.assertEqual(DataBag.objects.get(data__isnull={"it's": False}), quoted)
+        for lookup in ('gt', 'lte', 'contains', 'isnull'):
+            (sql, params), (other_sql, other_params) = [
+                DataBag.objects.filter(**{'data__%s' % lookup: {key: 1}}).query.sql_with_params()
+                for key in ('v', 'v2')
+            ]
+            self.assertEqual(sql, other_sql)
+        # the same prepared statement serves any key
+        sql, params = DataBag.objects.filter(data__gt={'v': 1}).query.sql_with_params()
+        statement = sql % tuple('$%d' % (index + 1) for index in range(len(params)))
+        with connection.cursor() as cursor:
+            cursor.execute('PREPARE hstore_lookup AS %s' % statement)
+            try:
+                for key, expected in (('v', 1), ('v2', 2)):
+                    cursor.execute('EXECUTE hstore_lookup (%s, %s)', [key, 1])
+                    self.assertEqual(len(cursor.fetchall()), expected)
+            finally:
+                cursor.execute('DEALLOCATE hstore_lookup')
+
+    def test_has_key_lookups(self):
+        alpha, beta = self._create_bags()
+        gamma = DataBag.objects.create(name='gamma', data={'v3': '5'})
+        self.assertEqual(list(DataBag.objects.filter(data__has_key='v3')), [gamma])
+        self.assertEqual(DataBag.objects.filter(data__has_keys=['v', 'v2']).count(), 2)
+        self.assertEqual(DataBag.objects.filter(data__has_keys=['v', 'v3']).count(), 0)
+        self.assertEqual(DataBag.objects.filter(data__has_any_keys=['v2', 'v3']).count(), 3)
+        self.assertEqual(DataBag.objects.filter(data__has_any_keys=['v4']).count(), 0)
+        self.assertEqual(list(DataBag.objects.exclude(data__has_any_keys=['v', 'v2'])), [gamma])
+        with self.assertRaises(ValueError):
+            DataBag.objects.filter(data__has_key=['v'])
+        with self.assertRaises(ValueError):
+            DataBag.objects.filter(data__has_any_keys=[])
+
+    def test_key_transforms(self):
+        cheap = DataBag.objects.create(name='cheap', data={'price': '9', 'day': '2016-01-01', 'sale': 'true'})
+        expensive = DataBag.objects.create(name='expensive', data={'price': '10', 'day': '2016-02-01'})
+        self.assertEqual(DataBag.objects.get(data__price='9'), cheap)
+        self.assertEqual(DataBag.objects.get(data__price__startswith='1'), expensive)
+        # compared as text '9' > '10'
+        self.assertEqual(DataBag.objects.get(data__price__gt='5'), cheap)
+        self.assertEqual(DataBag.objects.get(data__price__int__gt=9), expensive)
+        self.assertEqual(DataBag.objects.get(data__price__numeric__lte=Decimal('9.5')), cheap)
+        self.assertEqual(DataBag.objects.get(data__day__date__range=(datetime.date(2016, 1, 15),
+                                                                      datetime.date(2016, 2, 15))), expensive)
+        self.assertEqual(DataBag.objects.get(data__sale__bool=True), cheap)
+        self.assertEqual(DataBag.objects.get(data__sale__isnull=True), expensive)
+        self.assertEqual(DataBag.objects.filter(data__price__int__in=[9, 10]).count(), 2)
+        # the shape of the key expressions is the same as the one of the lookups
+        sql, params = DataBag.objects.filter(data__price__int__gt=9).query.sql_with_params()
+        self.assertIn('"data" -> %s::text)::bigint >', sql)
+
+    if DJANGO_VERSION[:2] >= (1, 9):
+        def test_hstore_key(self):
+            cheap = DataBag.objects.create(name='cheap', data={'price': '9'})
+            expensive = DataBag.objects.create(name='expensive', data={'price': '10'})
+            queryset = DataBag.objects.annotate(price=hstore_key('data', 'price', 'int'))
+            self.assertEqual(list(queryset.order_by('-price')), [expensive, cheap])
+            self.assertEqual(list(queryset.order_by('price').values_list('name', 'price')), [('cheap', 9), ('expensive', 10)])
+            self.assertEqual(queryset.get(price__lt=10), cheap)
+            self.assertEqual(DataBag.objects.annotate(price=hstore_key('data', 'price')).get(price='10'), expensive)
+            with self.assertRaises(ValueError):
+                hstore_key('data', 'price', 'money')
+
+    def test_gin_contains(self):
+        alpha, beta = self._create_bags()
+        self.assertEqual(DataBag.objects.get(data__gin_contains={'v': 1, 'v2': '3'}), alpha)
+        queryset = DataBag.objects.filter(data__gin_contains={'v': ['1', 2], 'v2': ['3', '4']})
+        self.assertEqual(queryset.count(), 2)
+        self.assertEqual(DataBag.objects.filter(data__gin_contains={'v': ['1'], 'v2': '4'}).count(), 0)
+        self.assertEqual(DataBag.objects.filter(data__gin_contains=['v', 'v2']).count(), 2)
+        sql, params = DataBag.objects.filter(data__gin_contains={'v': ['1', 2]}).query.sql_with_params()
+        self.assertEqual(sql.count('@>'), 2)
+        with self.assertRaises(ValueError):
+            DataBag.objects.get(data__gin_contains='v')
+
+    def test_gin_contains_index_scan(self):
+        for i in range(10):
+            GinDataBag.objects.create(name=str(i), data={'v': str(i), 'even': str(i % 2 == 0).lower()})
+        table = GinDataBag._meta.db_table
+        queries = [
+            GinDataBag.objects.filter(data__contains={'v': 1}),
+            GinDataBag.objects.filter(data__contains={'v': ['1', '2']}),
+            DataBag.objects.filter(data__gin_contains={'v': 1})
+        ]
+        with connection.cursor() as cursor:
+            cursor.execute('CREATE INDEX gin_data_idx ON %s USING gin (data)' % table)
+            cursor.execute('CREATE INDEX data_gin_idx ON %s USING gin (data)' % DataBag._meta.db_table)
+            cursor.execute('SET enable_seqscan = off')
+            try:
+                for queryset in queries:
+                    sql, params = queryset.query.sql_with_params()
+                    cursor.execute('EXPLAIN %s' % sql, params)
+                    plan = '\n'.join(row[0] for row in cursor.fetchall())
+                    self.assertIn('Bitmap Index Scan', plan)
+            finally:
+                cursor.execute('SET enable_seqscan = on')
+                cursor.execute('DROP INDEX gin_data_idx')
+                cursor.execute('DROP INDEX data_gin_idx')
+        self.assertEqual(GinDataBag.objects.get(data__contains={'v': 1}).name, '1')
+        self.assertEqual(GinDataBag.objects.filter(data__contains={'v': ['1', '2'], 'even': True}).get().name, '2')
+
+    def _explain_with_index(self, operation, queryset):
+        state = ProjectState.from_apps(DataBag._meta.apps)
+        with connection.schema_editor() as editor:
+            operation.database_forwards('django_hstore_tests', editor, state, state)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+                sql, params = queryset.query.sql_with_params()
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                cursor.execute('SET enable_seqscan = on')
+        finally:
+            with connection.schema_editor() as editor:
+                operation.database_backwards('django_hstore_tests', editor, state, state)
+        return plan
+
+    def test_add_hstore_index(self):
+        self._create_bags()
+        for method in ('gin', 'gist'):
+            operation = AddHStoreIndex('databag', 'data', method, name='databag_data_%s' % method)
+            plan = self._explain_with_index(operation, DataBag.objects.filter(data__gin_contains={'v': 1}))
+            self.assertIn('databag_data_%s' % method, plan)
+        with self.assertRaises(ValueError):
+            AddHStoreIndex('databag', 'data', 'btree')
+
+    def test_add_hstore_key_index(self):
+        self._create_bags()
+        operation = AddHStoreKeyIndex('databag', 'data', 'v', 'int', name='databag_data_v_int')
+        plan = self._explain_with_index(operation, DataBag.objects.filter(data__v__int__gt=1))
+        self.assertIn('databag_data_v_int', plan)
+        plan = self._explain_with_index(operation, DataBag.objects.filter(data__gt={'v': 1}))
+        self.assertIn('databag_data_v_int', plan)
+        operation = AddHStoreKeyIndex('databag', 'data', 'v', name='databag_data_v')
+        plan = self._explain_with_index(operation, DataBag.objects.filter(data__v='1'))
+        self.assertIn('databag_data_v', plan)
+        with self.assertRaises(ValueError):
+            AddHStoreKeyIndex('databag', 'data', 'v', 'money')
+
+    def test_schema_key_indexes(self):
+        operations = schema_key_indexes('schemadatabag', 'data', [
+            {'name': 'number', 'class': 'IntegerField', 'kwargs': {'db_index': True}},
+            {'name': 'date', 'class': models.DateField, 'kwargs': {'db_index': True}},
+            {'name': 'char', 'class': 'CharField', 'kwargs': {'db_index': True, 'max_length': 32}},
+            {'name': 'float', 'class': 'FloatField'}
+        ], concurrently=True)
+        self.assertEqual([(op.key, op.cast, op.concurrently) for op in operations],
+                         [('number', 'int', True), ('date', 'date', True), ('char', None, True)])
+
     def test_hkeys(self):
         alpha, beta = self._create_bags()
         self.assertEqual(DataBag.objects.hkeys(id=alpha.id, attr='data'), ['v', 'v2'])
         self.assertEqual(DataBag.objects.hkeys(id=beta.id, attr='data'), ['v', 'v2'])
 
+    def test_hkeys_iter(self):
+        alpha, beta = self._create_bags()
+        empty = DataBag.objects.create(name='empty')
+        result = list(DataBag.objects.order_by('pk').hkeys_iter('data', chunk_size=1))
+        self.assertEqual([(pk, sorted(keys)) for pk, keys in result],
+                         [(alpha.pk, ['v', 'v2']), (beta.pk, ['v', 'v2']), (empty.pk, [])])
+        self.assertEqual(list(DataBag.objects.hkeys_iter('data', name='empty')), [(empty.pk, [])])
+
+    def test_hitems_iter(self):
+        alpha, beta = self._create_bags()
+        DataBag.objects.create(name='empty')
+        result = sorted(DataBag.objects.hitems_iter('data', chunk_size=3))
+        self.assertEqual(result, sorted([(alpha.pk, 'v', '1'), (alpha.pk, 'v2', '3'),
+                                         (beta.pk, 'v', '2'), (beta.pk, 'v2', '4')]))
+        self.assertEqual(list(DataBag.objects.none().hitems_iter('data')), [])
+        self.assertEqual(list(DataBag.objects.filter(pk__in=[]).hkeys_iter('data')), [])
+
+    def test_hitems_iter_partially_consumed(self):
+        self._create_bags()
+        with transaction.atomic():
+            iterator = DataBag.objects.hitems_iter('data', chunk_size=1)
+            self.assertEqual(len(next(iterator)), 3)
+        # the iterator doesn't hold a transaction of its own
+        with transaction.atomic():
+            iterator.close()
+        self.assertEqual(DataBag.objects.count(), 2)
+
+    def test_hkey_catalog(self):
+        self._create_bags()
+        DataBag.objects.create(name='gamma', data={'v3': '5'})
+        self.assertEqual(DataBag.objects.hkey_catalog('data'), ['v', 'v2', 'v3'])
+        self.assertEqual(DataBag.objects.hkey_catalog('data', counts=True), {'v': 2, 'v2': 2, 'v3': 1})
+        self.assertEqual(DataBag.objects.hkey_catalog('data', name='gamma'), ['v3'])
+        self.assertEqual(DataBag.objects.none().hkey_catalog('data'), [])
+
+    def test_hkey_catalog_sample(self):
+        if connection.pg_version < 90500:
+            return
+        self._create_bags()
+        self.assertEqual(DataBag.objects.hkey_catalog('data', counts=True, sample=100), {'v': 2, 'v2': 2})
+
+    def test_hkey_catalog_cache_disabled(self):
+        self._create_bags()
+        with self.assertRaises(ImproperlyConfigured):
+            DataBag.objects.hkey_catalog('data', cache_timeout=60)
+
     def test_hpeek(self):
         alpha, beta = self._create_bags()
         self.assertEqual(DataBag.objects.hpeek(id=alpha.id, attr='data', key='v'), '1')
         self.assertEqual(DataBag.objects.filter(id=alpha.id).hpeek(attr='data', key='v'), '1')
         self.assertEqual(DataBag.objects.hpeek(id=alpha.id, attr='data', key='invalid'), None)
 
+    def test_hpeek_many(self):
+        alpha, beta = self._create_bags()
+        gamma = DataBag.objects.create(name='gamma', data={'v3': '5'})
+        with self.assertNumQueries(1):
+            result = DataBag.objects.hpeek_many('data', 'v')
+        self.assertEqual(result, {alpha.pk: '1', beta.pk: '2', gamma.pk: None})
+        self.assertEqual(DataBag.objects.hpeek_many('data', 'v2', name='beta'), {beta.pk: '4'})
+        self.assertEqual(DataBag.objects.none().hpeek_many('data', 'v'), {})
+
+    def test_only_keys(self):
+        alpha, beta = self._create_bags()
+        bag = DataBag.objects.only_keys('data', ['v', 'v3']).get(pk=alpha.pk)
+        self.assertEqual(bag.data, {'v': '1'})
+        self.assertTrue(bag.data._partial)
+        bag.data['v3'] = '5'
+        bag.save()
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {'v': '1', 'v2': '3', 'v3': '5'})
+        # changes are tracked again after saving
+        del bag.data['v']
+        bag.name = 'renamed'
+        bag.save()
+        bag = DataBag.objects.get(pk=alpha.pk)
+        self.assertEqual((bag.name, bag.data), ('renamed', {'v2': '3', 'v3': '5'}))
+        self.assertFalse(bag.data._partial)
+        self.assertEqual([bag.data for bag in DataBag.objects.only_keys('data', ['v']).order_by('pk')],
+                         [{}, {'v': '2'}])
+        with self.assertRaises(ValueError):
+            DataBag.objects.only_keys('name', ['v'])
+
     def test_hremove(self):
         alpha, beta = self._create_bags()
         self.assertEqual(DataBag.objects.get(name='alpha').data, alpha.data)
@@ -407,12 +646,105 @@ class TestDictionaryField(TestCase):
         self.assertEqual(DataBag.objects.filter(id=alpha.id).hslice(attr='data', keys=['v']), {'v': '1'})
         self.assertEqual(DataBag.objects.hslice(id=alpha.id, attr='data', keys=['ggg']), {})
 
+    def test_hslice_values(self):
+        alpha, beta = self._create_bags()
+        result = list(DataBag.objects.order_by('pk').hslice_values('data', ['v'], chunk_size=1))
+        self.assertEqual(result, [(alpha.pk, {'v': '1'}), (beta.pk, {'v': '2'})])
+        self.assertEqual(list(DataBag.objects.hslice_values('data', ['ggg'], name='alpha')), [(alpha.pk, {})])
+        self.assertEqual(list(DataBag.objects.none().hslice_values('data', ['v'])), [])
+
+    def test_bulk_hremove(self):
+        alpha, beta = self._create_bags()
+        gamma = DataBag.objects.create(name='gamma', data={'v3': '5'})
+        self.assertEqual(DataBag.objects.bulk_hremove('data', {alpha.pk: ['v', 'v2'], beta.pk: 'v2', gamma.pk: []}), 3)
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {})
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '2'})
+        self.assertEqual(DataBag.objects.get(pk=gamma.pk).data, {'v3': '5'})
+        self.assertEqual(DataBag.objects.filter(name='alpha').bulk_hremove('data', {beta.pk: ['v']}), 0)
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '2'})
+        # pairs are removed only if the values have not changed
+        self.assertEqual(DataBag.objects.bulk_hremove('data', {beta.pk: {'v': '1'}, gamma.pk: {'v3': 5}}), 2)
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '2'})
+        self.assertEqual(DataBag.objects.get(pk=gamma.pk).data, {})
+        with self.assertRaises(ValueError):
+            DataBag.objects.bulk_hremove('data', {beta.pk: {'v': '2'}, gamma.pk: ['v3']})
+
+    def test_hincrement(self):
+        alpha, beta = self._create_bags()
+        self.assertEqual(DataBag.objects.hincrement('data', {'v': 1, 'counter': 2}), 2)
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {'v': '2', 'v2': '3', 'counter': '2'})
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '3', 'v2': '4', 'counter': '2'})
+        result = DataBag.objects.filter(name='alpha').hincrement('data', {'v2': -3, 'counter': Decimal('0.5')},
+                                                                  returning=True)
+        self.assertEqual(result, {alpha.pk: {'v2': 0, 'counter': Decimal('2.5')}})
+        self.assertEqual(DataBag.objects.hincrement('data', {'v': 1}, returning=True, name='nobody'), {})
+        self.assertEqual(DataBag.objects.filter(pk__in=[]).hincrement('data', {'v': 1}, returning=True), {})
+        DataBag.objects.filter(pk=beta.pk).hupdate('data', {'v': 'text'})
+        with self.assertRaises(DataError):
+            with transaction.atomic():
+                DataBag.objects.filter(pk=beta.pk).hincrement('data', {'v': 1})
+
+    def test_hmutate(self):
+        alpha, beta = self._create_bags()
+        mutation = DataBag.objects.filter(name='alpha').hmutate('data').remove('v2').set({'v3': 'a'}).incr({'v': 2})
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(mutation.execute(), 1)
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('UPDATE')]), 1)
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {'v': '3', 'v3': 'a'})
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '2', 'v2': '4'})
+        # a key removed and incremented by the same mutation starts from 0
+        DataBag.objects.hmutate('data', pk=beta.pk).remove(['v', 'v2']).incr({'v': 5}).incr({'v': 1}).execute()
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '6'})
+        with self.assertRaises(ValueError):
+            DataBag.objects.hmutate('data').set({'v': 'a'}).incr({'v': 1})
+        self.assertEqual(DataBag.objects.hmutate('data').execute(), 0)
+
+    def test_bulk_upsert(self):
+        if connection.pg_version < 90500:
+            return
+        alpha, beta = self._create_bags()
+        objs = [DataBag(pk=alpha.pk, name='alpha', data={'v3': 5}), DataBag(pk=beta.pk, name='beta', data={'v': '0'})]
+        self.assertEqual(DataBag.objects.bulk_upsert(objs, ['id'], merge_fields=['data']), 2)
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {'v': '1', 'v2': '3', 'v3': '5'})
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '0', 'v2': '4'})
+        self.assertEqual(DataBag.objects.bulk_upsert(objs, ['id'], merge_fields=()), 0)
+        # duplicates in the same batch are merged as if upserted one after the other
+        objs = [DataBag(pk=alpha.pk, name='alpha', data={'v': '7'}), DataBag(pk=alpha.pk, name='x', data={'v4': '8'})]
+        self.assertEqual(DataBag.objects.bulk_upsert(objs, ['id']), 1)
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {'v': '7', 'v2': '3', 'v3': '5', 'v4': '8'})
+        self.assertEqual([obj.pk for obj in objs], [alpha.pk, alpha.pk])
+        # new objects get the pk generated by the database
+        objs = [DataBag(name='new', data={'n': '1'}), DataBag(pk=beta.pk, name='beta', data={'v5': '9'})]
+        self.assertEqual(DataBag.objects.bulk_upsert(objs, ['id']), 2)
+        self.assertEqual(DataBag.objects.get(pk=objs[0].pk).data, {'n': '1'})
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '0', 'v2': '4', 'v5': '9'})
+        # NULL values don't wipe the stored ones
+        bag = NullableDataBag.objects.create(name='bag', data={'a': '1'})
+        NullableDataBag.objects.bulk_upsert([NullableDataBag(pk=bag.pk, name='bag', data=None)], ['id'])
+        self.assertEqual(NullableDataBag.objects.get(pk=bag.pk).data, {'a': '1'})
+
     def test_hupdate(self):
         alpha, beta = self._create_bags()
         self.assertEqual(DataBag.objects.get(name='alpha').data, alpha.data)
         DataBag.objects.filter(name='alpha').hupdate('data', {'v2': '10', 'v3': '20'})
         self.assertEqual(DataBag.objects.get(name='alpha').data, {'v': '1', 'v2': '10', 'v3': '20'})
 
+    def test_bulk_hupdate(self):
+        alpha, beta = self._create_bags()
+        gamma = DataBag.objects.create(name='gamma')
+        updates = {alpha.pk: {'v2': '10'}, beta.pk: {'v3': 5}, gamma.pk: {'v': '7'}}
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(DataBag.objects.bulk_hupdate('data', updates, batch_size=2), 3)
+        self.assertEqual(len([query for query in context.captured_queries if query['sql'].startswith('UPDATE')]), 2)
+        self.assertEqual(DataBag.objects.get(pk=alpha.pk).data, {'v': '1', 'v2': '10'})
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data, {'v': '2', 'v2': '4', 'v3': '5'})
+        self.assertEqual(DataBag.objects.get(pk=gamma.pk).data, {'v': '7'})
+        # only the rows of the queryset are updated
+        rows = DataBag.objects.filter(name='alpha').bulk_hupdate('data', {alpha.pk: {'v': '0'}, beta.pk: {'v': '0'}})
+        self.assertEqual(rows, 1)
+        self.assertEqual(DataBag.objects.get(pk=beta.pk).data['v'], '2')
+        self.assertEqual(DataBag.objects.none().bulk_hupdate('data', {alpha.pk: {'v': '0'}}), 0)
+
     def test_hupdate_atomic(self):
         """ https://github.com/djangonauts/django-hstore/issues/84 """
         if hasattr(transaction, 'atomic'):
@@ -699,3 +1031,121 @@ class TestDictionaryField(TestCase):
         self.assertEqual(get_cast_for_param({'a': float}, 'a'), '::float8')
         from decimal import Decimal
         self.assertEqual(get_cast_for_param({'a': Decimal}, 'a'), '::numeric')
+
+    def test_track_changes_saves_delta(self):
+        data = dict(('key%d' % i, 'value%d' % i) for i in range(100))
+        bag = TrackedDataBag.objects.create(name='tracked', data=data)
+        bag = TrackedDataBag.objects.get(pk=bag.pk)
+        bag.data['key1'] = 'changed'
+        del bag.data['key2']
+        bag.data['new'] = '1'
+        with CaptureQueriesContext(connection) as context:
+            bag.save()
+        sql = context.captured_queries[-1]['sql']
+        self.assertIn('changed', sql)
+        self.assertNotIn('value50', sql)
+        data['key1'] = 'changed'
+        data['new'] = '1'
+        del data['key2']
+        self.assertEqual(TrackedDataBag.objects.get(pk=bag.pk).data, data)
+
+    def test_track_changes_preserves_concurrent_updates(self):
+        bag = TrackedDataBag.objects.create(name='tracked', data={'a': '1', 'b': '2'})
+        bag = TrackedDataBag.objects.get(pk=bag.pk)
+        TrackedDataBag.objects.filter(pk=bag.pk).hupdate('data', {'c': '3'})
+        bag.data['a'] = '10'
+        bag.save()
+        self.assertEqual(TrackedDataBag.objects.get(pk=bag.pk).data, {'a': '10', 'b': '2', 'c': '3'})
+        # tracking is reset after saving
+        bag.data.pop('b')
+        bag.save()
+        self.assertEqual(TrackedDataBag.objects.get(pk=bag.pk).data, {'a': '10', 'c': '3'})
+
+    def test_track_changes_assigned_loaded_value(self):
+        alpha = TrackedDataBag.objects.create(name='alpha', data={'a': '1'})
+        beta = TrackedDataBag.objects.create(name='beta', data={'b': '2'})
+        other = TrackedDataBag.objects.get(pk=beta.pk)
+        other.data = TrackedDataBag.objects.filter(pk=alpha.pk).values_list('data', flat=True)[0]
+        other.save()
+        self.assertEqual(TrackedDataBag.objects.get(pk=beta.pk).data, {'a': '1'})
+        value = TrackedDataBag.objects.filter(pk=alpha.pk).values_list('data', flat=True)[0]
+        value['c'] = '3'
+        TrackedDataBag(pk=beta.pk, name='beta', data=value).save()
+        self.assertEqual(TrackedDataBag.objects.get(pk=beta.pk).data, {'a': '1', 'c': '3'})
+
+    def test_track_changes_proxy_and_subclass(self):
+        for model in (TrackedDataBagProxy, TrackedDataBagChild):
+            bag = model.objects.create(name='tracked', data={'a': '1', 'b': '2'})
+            bag = model.objects.get(pk=bag.pk)
+            del bag.data['b']
+            bag.save()
+            # the key deleted by the previous save is not deleted again
+            TrackedDataBag.objects.filter(pk=bag.pk).hupdate('data', {'b': '3'})
+            bag.data['a'] = '10'
+            bag.save()
+            self.assertEqual(model.objects.get(pk=bag.pk).data, {'a': '10', 'b': '3'})
+        # the saves of the models without dictionary fields are not handled
+        field = TrackedDataBag._meta.get_field('data')
+        self.assertFalse(post_save.disconnect(field._mark_clean, sender=User))
+
+    def test_track_changes_replaced_dictionary(self):
+        bag = TrackedDataBag.objects.create(name='tracked', data={'a': '1', 'b': '2'})
+        bag = TrackedDataBag.objects.get(pk=bag.pk)
+        bag.data = {'c': 3}
+        bag.save()
+        self.assertTrue(bag.data._tracking)
+        self.assertEqual(TrackedDataBag.objects.get(pk=bag.pk).data, {'c': '3'})
+        # saving new instances starts tracking
+        bag = TrackedDataBag(name='new', data={'a': '1'})
+        bag.save()
+        self.assertTrue(bag.data._tracking)
+
+    def test_from_db_value(self):
+        alpha, beta = self._create_bags()
+        bag = DataBag.objects.get(pk=alpha.pk)
+        self.assertTrue(isinstance(bag.data, HStoreDict))
+        self.assertIs(bag.data.instance, bag)
+        self.assertIs(bag.data.field, DataBag._meta.get_field('data'))
+        self.assertEqual(bag.data, {'v': '1', 'v2': '3'})
+        self.assertEqual(DataBag.objects.filter(pk=alpha.pk).values_list('data', flat=True)[0], {'v': '1', 'v2': '3'})
+
+    def test_from_db_does_not_convert(self):
+        raw = {'a': '1', 'b': None}
+        value = HStoreDict.from_db(raw)
+        self.assertEqual(value, raw)
+        self.assertIsNot(value, raw)
+        self.assertIsNone(value.instance)
+
+    def test_lazy_loading(self):
+        bag = LazyDataBag.objects.create(name='lazy', data={'a': 1})
+        bag = LazyDataBag.objects.get(pk=bag.pk)
+        self.assertNotIsInstance(bag.__dict__['data'], HStoreDict)
+        self.assertEqual(bag.name, 'lazy')
+        self.assertEqual(bag.data, {'a': '1'})
+        self.assertTrue(isinstance(bag.__dict__['data'], HStoreDict))
+        self.assertIs(bag.data.instance, bag)
+
+    def test_lazy_save_without_access(self):
+        bag = LazyDataBag.objects.create(name='lazy', data={'a': '1'})
+        bag = LazyDataBag.objects.get(pk=bag.pk)
+        LazyDataBag.objects.filter(pk=bag.pk).hupdate('data', {'b': '2'})
+        bag.name = 'renamed'
+        bag.save()
+        bag = LazyDataBag.objects.get(pk=bag.pk)
+        self.assertEqual(bag.name, 'renamed')
+        self.assertEqual(bag.data, {'a': '1', 'b': '2'})
+        bag.data['c'] = 3
+        bag.save()
+        self.assertEqual(LazyDataBag.objects.get(pk=bag.pk).data, {'a': '1', 'b': '2', 'c': '3'})
+
+    def test_lazy_overwrite_existing_row(self):
+        bag = LazyDataBag.objects.create(name='lazy', data={'a': '1'})
+        LazyDataBag(pk=bag.pk, name='overwritten', data={'x': '1'}).save()
+        bag = LazyDataBag.objects.get(pk=bag.pk)
+        self.assertEqual(bag.name, 'overwritten')
+        self.assertEqual(bag.data, {'x': '1'})
+
+    def test_lazy_user_values_are_converted(self):
+        bag = LazyDataBag(pk=10, name='lazy', data={'a': 1, 'b': True})
+        self.assertEqual(bag.data, {'a': '1', 'b': 'true'})
+        self.assertFalse(bag.data._tracking)
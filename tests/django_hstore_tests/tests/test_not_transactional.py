@@ -1,6 +1,8 @@
 from django import VERSION as DJANGO_VERSION
+from django.core.cache import cache
 from django.db import connection, transaction
 from django.test import SimpleTestCase
+from django.test.utils import override_settings
 
 from django_hstore.fields import HStoreDict
 
@@ -26,3 +28,25 @@ class TestNotTransactional(SimpleTestCase):
         obj1.delete()
         obj2.delete()
         connection.close()
+
+    @override_settings(DJANGO_HSTORE_CATALOG_CACHE='default')
+    def test_hkey_catalog_cache(self):
+        cache.clear()
+        alpha = DataBag.objects.create(name='alpha', data={'v': '1'})
+        gamma = DataBag.objects.create(name='gamma', data={'v2': '2'})
+        try:
+            self.assertEqual(DataBag.objects.hkey_catalog('data', cache_timeout=60), ['v', 'v2'])
+            DataBag.objects.filter(pk=gamma.pk).update(data={'v3': '5'})
+            with self.assertNumQueries(0):
+                self.assertEqual(DataBag.objects.hkey_catalog('data', cache_timeout=60), ['v', 'v2'])
+            with transaction.atomic():
+                DataBag.objects.filter(pk=alpha.pk).hupdate('data', {'v4': '6'})
+                if DJANGO_VERSION[:2] >= (1, 9):
+                    # invalidated once the transaction is committed
+                    self.assertEqual(DataBag.objects.hkey_catalog('data', cache_timeout=60), ['v', 'v2'])
+            self.assertEqual(DataBag.objects.hkey_catalog('data', cache_timeout=60), ['v', 'v3', 'v4'])
+            DataBag.objects.filter(pk=alpha.pk).hremove('data', 'v4')
+            self.assertEqual(DataBag.objects.hkey_catalog('data', cache_timeout=60), ['v', 'v3'])
+        finally:
+            alpha.delete()
+            gamma.delete()
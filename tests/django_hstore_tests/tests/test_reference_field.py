@@ -1,12 +1,33 @@
+import sys
+
 from django import forms
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.management import call_command
 from django.core.urlresolvers import reverse
+from django.db import connection
+from django.db.migrations.state import ProjectState
 from django.test import TestCase
 
+from django_hstore.dict import HStoreReferenceDict
 from django_hstore.forms import ReferencesFieldWidget
-from django_hstore.utils import acquire_reference, serialize_references, unserialize_references
+from django_hstore.management.commands.hstore_sweep_references import Command as SweepReferencesCommand
+from django_hstore.operations import AddReferencesIndex
+from django_hstore.utils import (
+    ReferenceResolver,
+    acquire_reference,
+    acquire_references,
+    format_reference,
+    serialize_references,
+    unserialize_references
+)
+
+from django_hstore_tests.models import CompactRefsBag, NullableRefsBag, Ref, RefsBag
 
-from django_hstore_tests.models import NullableRefsBag, Ref, RefsBag
+if sys.version_info[0] >= 3:
+    from io import StringIO
+else:
+    from StringIO import StringIO
 
 
 class TestReferencesField(TestCase):
@@ -40,6 +61,12 @@ class TestReferencesField(TestCase):
         alpha = RefsBag.objects.get(name='alpha')
         self.assertEqual(Ref.objects.get(name='0'), alpha.refs['0'])
 
+    def test_retrieval_from_db_value(self):
+        alpha, beta, refs = self._create_bags()
+        alpha = RefsBag.objects.get(name='alpha')
+        self.assertTrue(isinstance(alpha.refs, HStoreReferenceDict))
+        self.assertIs(alpha.refs.instance, alpha)
+
     def test_simple_retrieval_get(self):
         alpha, beta, refs = self._create_bags()
         alpha = RefsBag.objects.get(name='alpha')
@@ -190,3 +217,191 @@ class TestReferencesField(TestCase):
 
         form = HForm()
         self.assertEqual(form.fields['refs'].widget.__class__, CustomWidget)
+
+    def test_resolve_all(self):
+        refs = [Ref.objects.create(name=str(i)) for i in range(40)]
+        bag = RefsBag.objects.create(name='bag', refs=dict((str(i), ref) for i, ref in enumerate(refs)))
+        bag = RefsBag.objects.get(pk=bag.pk)
+        with self.assertNumQueries(1):
+            bag.refs.resolve_all()
+        with self.assertNumQueries(0):
+            for i, ref in enumerate(refs):
+                self.assertEqual(bag.refs[str(i)], ref)
+
+    def test_resolve_all_missing_reference(self):
+        alpha, beta, refs = self._create_bags()
+        alpha = RefsBag.objects.get(name='alpha')
+        refs[0].delete()
+        alpha.refs.resolve_all()
+        self.assertIsNone(alpha.refs['0'])
+        self.assertEqual(alpha.refs['1'], refs[1])
+
+    def test_acquire_references(self):
+        alpha, beta, refs = self._create_bags()
+        serialized = serialize_references(dict((str(i), ref) for i, ref in enumerate(refs)))
+        with self.assertNumQueries(1):
+            instances = acquire_references(serialized.values())
+        self.assertEqual(instances[serialized['2']], refs[2])
+        # invalid references are left out
+        instances = acquire_references(['invalid', 'idontexist.Model:1', serialized['1'], serialized['1'] + 'x'])
+        self.assertEqual(instances, {serialized['1']: refs[1]})
+        # non canonical identifiers
+        reference = format_reference(Ref, '0%s' % refs[1].pk)
+        instances = acquire_references([reference, serialized['1']])
+        self.assertEqual(instances, {reference: refs[1], serialized['1']: refs[1]})
+
+    def test_prefetch_references_invalid(self):
+        alpha, beta, refs = self._create_bags()
+        RefsBag.objects.filter(pk=alpha.pk).hupdate('refs', {'2': 'invalid'})
+        bags = list(RefsBag.objects.prefetch_references('refs').order_by('name'))
+        self.assertEqual(bags[0].refs['0'], refs[0])
+        self.assertEqual(bags[1].refs['1'], refs[3])
+        with self.assertRaises(ValueError):
+            bags[0].refs['2']
+
+    def test_prefetch_references(self):
+        alpha, beta, refs = self._create_bags()
+        with self.assertNumQueries(2):
+            bags = list(RefsBag.objects.prefetch_references('refs').order_by('name'))
+            self.assertEqual(bags[0].refs['0'], refs[0])
+            self.assertEqual(bags[0].refs['1'], refs[1])
+            self.assertEqual(bags[1].refs['0'], refs[2])
+            self.assertEqual(bags[1].refs['1'], refs[3])
+
+    def test_prefetch_references_iterator(self):
+        alpha, beta, refs = self._create_bags()
+        queryset = RefsBag.objects.filter(name__in=['alpha', 'beta']).order_by('name')
+        with self.assertNumQueries(3):
+            bags = list(queryset.prefetch_references('refs', chunk_size=1).iterator())
+            self.assertEqual(bags[1].refs['1'], refs[3])
+        # values are left alone
+        self.assertEqual(
+            queryset.prefetch_references('refs').values_list('refs', flat=True)[0],
+            serialize_references(alpha.refs)
+        )
+        with self.assertNumQueries(1):
+            list(queryset.prefetch_references('refs').prefetch_references(None))
+
+    def test_reference_resolver(self):
+        resolver = ReferenceResolver(maxsize=1)
+        self.assertIs(resolver.get_model('django_hstore_tests.models.Ref'), Ref)
+        self.assertIs(resolver.get_model('django_hstore_tests.models.Ref'), Ref)
+        self.assertEqual(resolver.misses, 1)
+        self.assertIs(resolver.get_model('django_hstore_tests.models.RefsBag'), RefsBag)
+        self.assertIs(resolver.get_model('django_hstore_tests.models.Ref'), Ref)
+        self.assertEqual(resolver.misses, 3)
+        with self.assertRaises(ImportError):
+            resolver.get_model('idontexist.Model')
+        # errors are cached as well
+        resolver = ReferenceResolver()
+        for i in range(3):
+            with self.assertRaises(ImportError):
+                resolver.get_model('idontexist.Model')
+        self.assertEqual(resolver.misses, 1)
+
+    def test_compact_references(self):
+        ref = Ref.objects.create(name='compact')
+        bag = CompactRefsBag.objects.create(name='bag', refs={'ref': ref})
+        content_type = ContentType.objects.get_for_model(Ref)
+        raw = CompactRefsBag.objects.values_list('refs', flat=True).get(pk=bag.pk)
+        self.assertEqual(dict(raw), {'ref': '%s:%s' % (content_type.pk, ref.pk)})
+        bag = CompactRefsBag.objects.get(pk=bag.pk)
+        self.assertEqual(bag.refs['ref'], ref)
+        self.assertEqual(CompactRefsBag.objects.filter(refs__contains={'ref': ref}).count(), 1)
+
+    def test_compact_references_decode_full_path(self):
+        ref = Ref.objects.create(name='full')
+        bag = CompactRefsBag.objects.create(name='bag', refs={'ref': serialize_references({'ref': ref})['ref']})
+        bag = CompactRefsBag.objects.get(pk=bag.pk)
+        self.assertEqual(bag.refs['ref'], ref)
+
+    def test_rewrite_references_command(self):
+        refs = [Ref.objects.create(name=str(i)) for i in range(3)]
+        for ref in refs:
+            CompactRefsBag.objects.create(name=ref.name, refs=serialize_references({'ref': ref, 'other': ref}))
+        call_command('hstore_rewrite_references', 'django_hstore_tests.CompactRefsBag', 'refs',
+                     batch_size=2, stdout=StringIO())
+        content_type = ContentType.objects.get_for_model(Ref)
+        for ref in refs:
+            reference = '%s:%s' % (content_type.pk, ref.pk)
+            bag = CompactRefsBag.objects.get(name=ref.name)
+            self.assertEqual(dict(bag.refs), {'ref': reference, 'other': reference})
+
+    def test_references_lookup(self):
+        alpha, beta, refs = self._create_bags()
+        self.assertEqual(list(RefsBag.objects.filter(refs__references=refs[0])), [alpha])
+        self.assertEqual(list(RefsBag.objects.filter(refs__references=refs[3])), [beta])
+        self.assertEqual(RefsBag.objects.filter(refs__references=[refs[1], refs[2]]).count(), 2)
+        self.assertEqual(RefsBag.objects.exclude(refs__references=refs[1]).get(), beta)
+        self.assertEqual(RefsBag.objects.filter(refs__references=Ref(pk=0)).count(), 0)
+
+    def test_references_lookup_compact(self):
+        ref = Ref.objects.create(name='ref')
+        compact = CompactRefsBag.objects.create(name='compact', refs={'ref': ref})
+        full = CompactRefsBag.objects.create(name='full', refs=serialize_references({'ref': ref}))
+        queryset = CompactRefsBag.objects.filter(refs__references=ref).order_by('pk')
+        self.assertEqual(list(queryset), [compact, full])
+
+    def test_add_references_index(self):
+        self._create_bags()
+        operation = AddReferencesIndex('refsbag', 'refs', name='refsbag_refs_avals')
+        state = ProjectState.from_apps(RefsBag._meta.apps)
+        with connection.schema_editor() as editor:
+            operation.database_forwards('django_hstore_tests', editor, state, state)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+                sql, params = RefsBag.objects.filter(refs__references=Ref(pk=1)).query.sql_with_params()
+                cursor.execute('EXPLAIN ' + sql, params)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                cursor.execute('SET enable_seqscan = on')
+            self.assertIn('refsbag_refs_avals', plan)
+        finally:
+            with connection.schema_editor() as editor:
+                operation.database_backwards('django_hstore_tests', editor, state, state)
+
+    def test_sweep_references_command(self):
+        alpha, beta, refs = self._create_bags()
+        gamma = RefsBag.objects.create(name='gamma', refs={'0': refs[0], 'x': 'idontexist.Model:1'})
+        refs[0].delete()
+        refs[3].delete()
+        out = StringIO()
+        call_command('hstore_sweep_references', 'django_hstore_tests.RefsBag', 'refs',
+                     batch_size=2, stdout=out)
+        self.assertEqual(list(RefsBag.objects.get(pk=alpha.pk).refs.keys()), ['1'])
+        self.assertEqual(list(RefsBag.objects.get(pk=beta.pk).refs.keys()), ['0'])
+        self.assertEqual(list(dict(RefsBag.objects.get(pk=gamma.pk).refs).keys()), ['x'])
+        self.assertIn('3 dangling references removed, 1 invalid references skipped', out.getvalue())
+
+    def test_sweep_references_non_canonical_identifier(self):
+        alpha, beta, refs = self._create_bags()
+        reference = format_reference(Ref, '0%s' % refs[1].pk)
+        gamma = RefsBag.objects.create(name='gamma', refs={'0': reference, '1': format_reference(Ref, 'x')})
+        refs[0].delete()
+        out = StringIO()
+        call_command('hstore_sweep_references', 'django_hstore_tests.RefsBag', 'refs', stdout=out)
+        self.assertEqual(dict(RefsBag.objects.get(pk=gamma.pk).refs)['0'], reference)
+        self.assertIn('1 dangling references removed, 1 invalid references skipped', out.getvalue())
+
+    def test_sweep_references_concurrent_update(self):
+        alpha, beta, refs = self._create_bags()
+        refs[0].delete()
+        command = SweepReferencesCommand()
+        field = RefsBag._meta.get_field('refs')
+        items = command.fetch_references(RefsBag, field, [alpha.pk, beta.pk], 'default')
+        self.assertEqual(len(items), 4)
+        removals, invalid = command.find_dangling(items, 'default')
+        self.assertEqual(list(removals.keys()), [alpha.pk])
+        # the key is pointed to a live instance after the references have been read
+        RefsBag.objects.bulk_hupdate('refs', {alpha.pk: {'0': refs[2]}})
+        RefsBag.objects.bulk_hremove('refs', removals)
+        self.assertEqual(RefsBag.objects.get(pk=alpha.pk).refs['0'], refs[2])
+
+    def test_sweep_references_command_resume(self):
+        alpha, beta, refs = self._create_bags()
+        refs[0].delete()
+        refs[2].delete()
+        call_command('hstore_sweep_references', 'django_hstore_tests.RefsBag', 'refs',
+                     start_pk=alpha.pk, stdout=StringIO())
+        self.assertEqual(len(RefsBag.objects.get(pk=alpha.pk).refs), 2)
+        self.assertEqual(list(RefsBag.objects.get(pk=beta.pk).refs.keys()), ['1'])
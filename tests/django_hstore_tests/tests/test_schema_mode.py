@@ -396,6 +396,23 @@ class TestSchemaMode(TestCase):
         self.assertEqual(d.char, '')
         self.assertEqual(d.number, 0)
 
+    def test_typed_value_cache(self):
+        d = SchemaDataBag.objects.create(name='cache', data={'number': 3, 'decimal': '1.50'})
+        d = SchemaDataBag.objects.get(pk=d.pk)
+        for i in range(10):
+            self.assertEqual(d.number, 3)
+        self.assertEqual(d.data.cache_info().misses, 1)
+        self.assertEqual(d.data.cache_info().hits, 9)
+        self.assertEqual(d.data.cache_info().currsize, 1)
+        # invalidation
+        d.number = 4
+        self.assertEqual(d.number, 4)
+        d.data.update({'number': 5})
+        self.assertEqual(d.number, 5)
+        del d.data['number']
+        self.assertEqual(d.number, 0)
+        self.assertEqual(d.data.cache_info().misses, 3)
+
     if django.VERSION >= (1, 7):
         def _test_migrations_issue_103(self):
             """ failing test for https://github.com/djangonauts/django-hstore/issues/103 """
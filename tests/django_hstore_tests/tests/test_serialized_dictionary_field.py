@@ -5,6 +5,7 @@ from django import forms
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.core.urlresolvers import reverse
+from django.db import connection
 from django.db.models.aggregates import Count
 from django.test import TestCase
 
@@ -341,6 +342,10 @@ class TestSerializedDictionaryField(TestCase):
         self.assertEqual(SerializedDataBag.objects.filter(id=alpha.id).hpeek(attr='data', key='v'), 1)
         self.assertEqual(SerializedDataBag.objects.hpeek(id=alpha.id, attr='data', key='invalid'), None)
 
+    def test_hpeek_many(self):
+        alpha, beta = self._create_bags()
+        self.assertEqual(SerializedDataBag.objects.hpeek_many('data', 'v'), {alpha.pk: 1, beta.pk: 2})
+
     def test_hremove(self):
         alpha, beta = self._create_bags()
         self.assertEqual(SerializedDataBag.objects.get(name='alpha').data, alpha.data)
@@ -357,12 +362,40 @@ class TestSerializedDictionaryField(TestCase):
         self.assertEqual(SerializedDataBag.objects.filter(id=alpha.id).hslice(attr='data', keys=['v']), {'v': 1})
         self.assertEqual(SerializedDataBag.objects.hslice(id=alpha.id, attr='data', keys=['ggg']), {})
 
+    def test_hslice_values(self):
+        alpha, beta = self._create_bags()
+        queryset = SerializedDataBag.objects.order_by('pk')
+        result = list(queryset.hslice_values('data', ['v', 'v3', 'ggg'], chunk_size=1))
+        self.assertEqual(result, [(alpha.pk, {'v': 1, 'v3': {'a': 1}}), (beta.pk, {'v': 2, 'v3': {'a': 2}})])
+        self.assertEqual(list(SerializedDataBag.objects.hslice_values('data', ['ggg'], name='alpha')), [(alpha.pk, {})])
+
     def test_hupdate(self):
         alpha, beta = self._create_bags()
         self.assertEqual(SerializedDataBag.objects.get(name='alpha').data, alpha.data)
         SerializedDataBag.objects.filter(name='alpha').hupdate('data', {'v2': '10', 'v3': {'a': '20'}})
         self.assertEqual(SerializedDataBag.objects.get(name='alpha').data, {'v': 1, 'v2': '10', 'v3': {'a': '20'}})
 
+    def test_bulk_hupdate(self):
+        alpha, beta = self._create_bags()
+        rows = SerializedDataBag.objects.bulk_hupdate('data', {alpha.pk: {'v2': 10}, beta.pk: {'v4': [1, 'a']}})
+        self.assertEqual(rows, 2)
+        self.assertEqual(SerializedDataBag.objects.get(pk=alpha.pk).data, {'v': 1, 'v2': 10, 'v3': {'a': 1}})
+        self.assertEqual(SerializedDataBag.objects.get(pk=beta.pk).data['v4'], [1, 'a'])
+
+    def test_bulk_upsert(self):
+        if connection.pg_version < 90500:
+            return
+        SerializedDataBagNoID.objects.create(slug='alpha', name='alpha', data={'v': 1})
+        objs = [
+            SerializedDataBagNoID(slug='alpha', name='ignored', data={'v2': [1, 2]}),
+            SerializedDataBagNoID(slug='beta', name='beta', data={'v': {'a': 1}})
+        ]
+        self.assertEqual(SerializedDataBagNoID.objects.bulk_upsert(objs, ['slug'], batch_size=1), 2)
+        alpha = SerializedDataBagNoID.objects.get(slug='alpha')
+        self.assertEqual((alpha.name, alpha.data), ('alpha', {'v': 1, 'v2': [1, 2]}))
+        self.assertEqual(SerializedDataBagNoID.objects.get(slug='beta').data, {'v': {'a': 1}})
+        self.assertFalse(objs[1]._state.adding)
+
     def test_hstore_model_field_validation(self):
         d = SerializedDataBag()
         with self.assertRaises(ValidationError):